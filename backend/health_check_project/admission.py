@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+# 數字越小優先權越高：互動式的用戶分析優先於保險公司的批量分析
+PRIORITY_USER = 0
+PRIORITY_INSURER = 1
+
+
+def _normalize_timeout(timeout):
+    # 未設定 deadline 時 gRPC 可能回傳極大的剩餘時間，視同不限時
+    if timeout is None or timeout >= threading.TIMEOUT_MAX:
+        return None
+    return max(timeout, 0.0)
+
+
+class AdmissionRejected(Exception):
+    """佇列已滿或等待逾時，retry_after 為建議的重試等待秒數。"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM 佇列已滿，建議 {retry_after:.1f} 秒後重試")
+        self.retry_after = retry_after
+
+
+class AdmissionDeadlineExceeded(AdmissionRejected):
+    """取得名額前呼叫端的 deadline 已過期，不再為已放棄的請求啟動生成。"""
+
+    def __init__(self):
+        Exception.__init__(self, "請求的 deadline 已過期，不送往 LLM")
+        self.retry_after = 0.0
+
+
+class _AdmissionStats:
+    def __init__(self, max_concurrent, max_queue, initial_service_time):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        # 以指數移動平均估計單次 LLM 呼叫耗時，用於計算重試等待時間
+        self._service_time = initial_service_time
+        self._admitted = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._last_wait = 0.0
+
+    def _retry_after(self):
+        return self._service_time * (len(self._waiters) + 1) / self.max_concurrent
+
+    def _estimated_wait(self):
+        # 名額全滿時新請求的預估排隊時間，尚有空位時為 0
+        return self._retry_after() if self._active >= self.max_concurrent else 0.0
+
+    def _check_deadline(self, timeout):
+        if timeout is not None and timeout <= 0:
+            self._rejected += 1
+            raise AdmissionDeadlineExceeded()
+
+    def _record_admit(self, wait):
+        self._admitted += 1
+        self._total_wait += wait
+        self._last_wait = wait
+
+    def _record_service_time(self, service_time):
+        self._service_time = 0.8 * self._service_time + 0.2 * service_time
+
+    def _snapshot(self):
+        return {
+            "queue_depth": len(self._waiters),
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "avg_wait": self._total_wait / self._admitted if self._admitted else 0.0,
+            "last_wait": self._last_wait,
+            "estimated_service_time": self._service_time,
+            "estimated_wait": self._estimated_wait(),
+        }
+
+
+class AdmissionController(_AdmissionStats):
+    """執行緒版本：限制同時送往 Ollama 的 LLM 呼叫數，等待者依優先權排隊，佇列滿時立即拒絕。"""
+
+    def __init__(self, max_concurrent=2, max_queue=32, initial_service_time=20.0):
+        super().__init__(max_concurrent, max_queue, initial_service_time)
+        self._lock = threading.Lock()
+
+    def acquire(self, priority, timeout=None):
+        start = time.monotonic()
+        timeout = _normalize_timeout(timeout)
+        with self._lock:
+            self._check_deadline(timeout)
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._record_admit(0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._rejected += 1
+                raise AdmissionRejected(self._retry_after())
+            event = threading.Event()
+            entry = (priority, next(self._seq), event)
+            heapq.heappush(self._waiters, entry)
+
+        event.wait(timeout)
+        with self._lock:
+            if not event.is_set():
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._rejected += 1
+                raise AdmissionRejected(self._retry_after())
+            self._record_admit(time.monotonic() - start)
+
+    def release(self, service_time):
+        with self._lock:
+            self._record_service_time(service_time)
+            if self._waiters:
+                # 名額直接交給優先權最高的等待者，active 數不變
+                _, _, event = heapq.heappop(self._waiters)
+                event.set()
+            else:
+                self._active -= 1
+
+    @contextmanager
+    def slot(self, priority, timeout=None):
+        self.acquire(priority, timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def retry_after(self):
+        with self._lock:
+            return self._retry_after()
+
+    def estimated_wait(self):
+        with self._lock:
+            return self._estimated_wait()
+
+    def stats(self):
+        with self._lock:
+            return self._snapshot()
+
+
+class AsyncAdmissionController(_AdmissionStats):
+    """grpc.aio 版本：以 asyncio Future 排隊，所有操作都在事件迴圈執行緒中進行。"""
+
+    def __init__(self, max_concurrent=2, max_queue=32, initial_service_time=20.0):
+        super().__init__(max_concurrent, max_queue, initial_service_time)
+
+    async def acquire(self, priority, timeout=None):
+        start = time.monotonic()
+        timeout = _normalize_timeout(timeout)
+        self._check_deadline(timeout)
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._record_admit(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._rejected += 1
+            raise AdmissionRejected(self._retry_after())
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            elif future.done() and not future.cancelled():
+                # 名額已交付但請求同時被取消，轉交給下一位
+                self._hand_off()
+            if isinstance(e, asyncio.TimeoutError):
+                self._rejected += 1
+                raise AdmissionRejected(self._retry_after())
+            raise
+        self._record_admit(time.monotonic() - start)
+
+    def _hand_off(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def release(self, service_time):
+        self._record_service_time(service_time)
+        self._hand_off()
+
+    @asynccontextmanager
+    async def slot(self, priority, timeout=None):
+        await self.acquire(priority, timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def retry_after(self):
+        return self._retry_after()
+
+    def estimated_wait(self):
+        return self._estimated_wait()
+
+    def stats(self):
+        return self._snapshot()
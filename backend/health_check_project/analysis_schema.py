@@ -0,0 +1,56 @@
+# LLM 結構化輸出的 JSON Schema，欄位對應 proto/data.proto 中的
+# UserHealthAnalysisResponse 與 InsurerHealthAnalysisResponse：
+# - recommended_policies 以陣列輸出，由服務端合併為 recommended_policy 字串
+# - metrics 由服務端直接以原始檢驗數值產生，不需 LLM 重新輸出
+# - 保險公司分析的 risks 與 policy_type 由 risk_engine 依規則計算，LLM 僅撰寫 summary 與 insurance_suitability
+# 透過 Ollama 的 format 參數傳入，生成時即受 Schema 約束。
+
+USER_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "advice": {"type": "string"},
+        "recommended_policies": {"type": "array", "items": {"type": "string"}, "minItems": 2}
+    },
+    "required": ["summary", "advice", "recommended_policies"]
+}
+
+INSURER_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "insurance_suitability": {"type": "string"}
+    },
+    "required": ["summary", "insurance_suitability"]
+}
+
+ANALYSIS_SCHEMAS = {"user": USER_ANALYSIS_SCHEMA, "insurer": INSURER_ANALYSIS_SCHEMA}
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+}
+
+
+def validate(value, schema, path="$"):
+    """依上方 Schema 使用到的子集（type、properties、required、items、minItems）驗證，回傳錯誤訊息列表。"""
+    expected = schema.get("type")
+    if expected and not _TYPE_CHECKS[expected](value):
+        return [f"{path} 應為 {expected}"]
+    errors = []
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}.{key} 缺少必要欄位")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], sub_schema, f"{path}.{key}"))
+    elif expected == "array":
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path} 至少需要 {schema['minItems']} 個項目")
+        if "items" in schema:
+            for i, item in enumerate(value):
+                errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
@@ -0,0 +1,67 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from embedding_cache import text_hash
+
+# 互動問答的語意快取：問題的嵌入與先前已回答的問題做餘弦相似度比較，超過門檻即直接回傳先前的回答。
+# 門檻過低時意思相反的問題（如「高血壓」與「低血壓」）也可能命中，調整前請先以實際問題驗證
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+
+
+def normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+class SemanticAnswerCache:
+    """以問題嵌入為鍵的回答快取；超過容量時淘汰最久未命中的回答，知識庫版本改變後舊回答失效。"""
+
+    def __init__(self, embedding, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_SIZE):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, query, version=None):
+        """回傳 (先前的回答, 相似度)；沒有足夠相似的問題時回傳 None。"""
+        vector = normalize(self.embedding.embed_query(query))
+        with self._lock:
+            best_key, best_similarity = None, -1.0
+            for key, (stored, value, stored_version) in list(self._items.items()):
+                if stored_version != version:
+                    del self._items[key]
+                    continue
+                similarity = sum(a * b for a, b in zip(vector, stored))
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+            if best_key is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+            self._items.move_to_end(best_key)
+            self.hits += 1
+            return self._items[best_key][1], best_similarity
+
+    def store(self, query, value, version=None):
+        vector = normalize(self.embedding.embed_query(query))
+        with self._lock:
+            key = text_hash(query)
+            self._items[key] = (vector, value, version)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._items), "evictions": self.evictions, "threshold": self.threshold
+            }
@@ -0,0 +1,183 @@
+"""
+分析服務的 Ollama 基準測試。
+
+layout：比較「固定前綴在前」與舊版「報告資料在前」兩種提示版面的 prompt eval 時間，
+        驗證連續請求時前綴 KV 快取的重用效果。
+stages：依 model_registry 的設定（或 --models 指定的模型）量測各階段的生成延遲，
+        用於評估 HyDE 等低成本階段改用小模型的效益。
+
+用法：
+    python benchmark.py layout --audience user --reports 8
+    python benchmark.py stages --reports 4
+    python benchmark.py stages --models llama3:8b,llama3.2:3b --stages hyde,user_summary
+"""
+import argparse
+import statistics
+import time
+
+from analysis_schema import ANALYSIS_SCHEMAS
+from model_registry import HYDE, INSURER_ANALYSIS, MODEL_STAGES, STAGE_OPTIONS, USER_SUMMARY, ModelRegistry
+from reference_ranges import evaluate_results, summarize_findings
+from risk_engine import assess_risks, format_risks
+from test import DEFAULT_DOCS, HYDE_PROMPT, INSURER_PROMPT, PROMPT_LAYOUTS, USER_PROMPT
+
+SAMPLE_RESULTS = {
+    "Glu-AC": "89 mg/dL", "HbA1c": "5.1 %", "LDL-C": "128 mg/dL", "HDL-C": "54 mg/dL", "TG": "98 mg/dL",
+    "UN": "13 mg/dL", "CRE": "0.9 mg/dL", "hsCRP": "0.38 mg/dL", "BP": "127/61 mmHg"
+}
+
+SAMPLE_CONTEXT = "\n".join(DEFAULT_DOCS.values())
+
+# first/main.py 互動問答的代表性提示
+INTERACTIVE_SAMPLE = """
+    你是一位專業的醫療助理，專門為台灣用戶提供服務。請使用繁體中文回答，並確保建議專業且易於理解。
+
+    ### 用戶查詢
+    {query}
+
+    ### 相關醫療知識
+    {context}
+
+    ### 回答
+    請根據用戶的查詢和醫療知識，提供具體的回答。回答必須使用繁體中文。
+"""
+INTERACTIVE_QUESTIONS = ["低密度脂蛋白膽固醇偏高該如何改善？", "高血壓患者每日鹽分攝取量建議為何？"]
+
+
+def sample_reports(count):
+    """產生數值各不相同的報告，模擬每次請求的資料都不同。"""
+    reports = []
+    for i in range(count):
+        results = dict(SAMPLE_RESULTS)
+        results["Glu-AC"] = f"{89 + i * 7} mg/dL"
+        results["LDL-C"] = f"{128 + i * 5} mg/dL"
+        results["BP"] = f"{117 + i * 3}/{61 + i} mmHg"
+        reports.append(results)
+    return reports
+
+
+def sample_queries(count):
+    return [summarize_findings(evaluate_results(results)) for results in sample_reports(count)]
+
+
+def generate(llm, prompt, **kwargs):
+    start = time.perf_counter()
+    result = llm.generate([prompt], **kwargs)
+    elapsed = time.perf_counter() - start
+    info = result.generations[0][0].generation_info or {}
+    eval_seconds = info.get("eval_duration", 0) / 1e9
+    return {
+        "latency": elapsed,
+        "prompt_eval_count": info.get("prompt_eval_count", 0),
+        "prompt_eval_ms": info.get("prompt_eval_duration", 0) / 1e6,
+        "eval_count": info.get("eval_count", 0),
+        "tokens_per_second": info.get("eval_count", 0) / eval_seconds if eval_seconds else 0.0,
+    }
+
+
+def build_layout_prompt(audience, layout, query):
+    prefix, data = PROMPT_LAYOUTS[audience]
+    variables = {"query": query, "context": SAMPLE_CONTEXT}
+    data = data.format(**{k: v for k, v in variables.items() if "{" + k + "}" in data})
+    # legacy：舊版提示將報告資料放在固定說明之前，每次請求的提示開頭都不同
+    return data + prefix if layout == "legacy" else prefix + data
+
+
+def run_layout(llm, audience, layout, queries):
+    kwargs = {"format": ANALYSIS_SCHEMAS[audience]} if audience in ANALYSIS_SCHEMAS else {}
+    return [generate(llm, build_layout_prompt(audience, layout, query), **kwargs) for query in queries]
+
+
+def summarize_layout(layout, rows):
+    # 第一個請求需建立前綴快取（冷啟動），暖機後的請求才反映快取重用效果
+    warm = rows[1:] or rows
+    print(
+        f"{layout:<8} 冷啟動 prompt eval {rows[0]['prompt_eval_ms']:8.1f} ms | "
+        f"暖機 prompt eval 平均 {statistics.mean(r['prompt_eval_ms'] for r in warm):8.1f} ms，"
+        f"實際計算 token 平均 {statistics.mean(r['prompt_eval_count'] for r in warm):6.1f} | "
+        f"端到端延遲平均 {statistics.mean(r['latency'] for r in warm):6.2f} s"
+    )
+
+
+def stage_requests(stage, count):
+    """各階段的代表性 (提示, 生成參數)，與 test.py 實際送出的內容一致。"""
+    reports = sample_reports(count)
+    if stage == HYDE:
+        return [(HYDE_PROMPT.format(query=summarize_findings(evaluate_results(r))), {}) for r in reports]
+    if stage == USER_SUMMARY:
+        return [
+            (USER_PROMPT.format(query=summarize_findings(evaluate_results(r)), context=SAMPLE_CONTEXT),
+             {"format": ANALYSIS_SCHEMAS["user"]})
+            for r in reports
+        ]
+    if stage == INSURER_ANALYSIS:
+        return [
+            (INSURER_PROMPT.format(
+                query=f"{summarize_findings(evaluate_results(r))}\n規則引擎評估的疾病風險：\n{format_risks(assess_risks(r))}",
+                context=SAMPLE_CONTEXT
+            ), {"format": ANALYSIS_SCHEMAS["insurer"]})
+            for r in reports
+        ]
+    questions = [INTERACTIVE_QUESTIONS[i % len(INTERACTIVE_QUESTIONS)] for i in range(count)]
+    return [(INTERACTIVE_SAMPLE.format(query=q, context=SAMPLE_CONTEXT), {}) for q in questions]
+
+
+def summarize_stage(stage, model, rows):
+    latencies = sorted(r["latency"] for r in rows)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{stage:<18} {model:<20} 延遲平均 {statistics.mean(latencies):6.2f} s，p95 {p95:6.2f} s | "
+        f"生成 token 平均 {statistics.mean(r['eval_count'] for r in rows):6.1f}，"
+        f"{statistics.mean(r['tokens_per_second'] for r in rows):6.1f} tokens/s"
+    )
+
+
+def run_layout_benchmark(args):
+    registry = ModelRegistry(base_url=args.base_url)
+    llm = registry.create(args.model, num_predict=args.num_predict)
+    queries = sample_queries(args.reports)
+    # 先載入模型，避免模型載入時間計入第一種版面
+    llm.invoke("你好")
+    for layout in ("legacy", "prefix"):
+        summarize_layout(layout, run_layout(llm, args.audience, layout, queries))
+
+
+def run_stage_benchmark(args):
+    registry = ModelRegistry(base_url=args.base_url)
+    stages = args.stages.split(",") if args.stages else list(MODEL_STAGES)
+    for stage in stages:
+        models = args.models.split(",") if args.models else [registry.models[stage]]
+        requests = stage_requests(stage, args.reports)
+        for model in models:
+            llm = registry.create(model, **STAGE_OPTIONS.get(stage, {}))
+            # 暖機：載入模型，避免載入時間計入量測
+            llm.invoke("你好")
+            rows = [generate(llm, prompt, **kwargs) for prompt, kwargs in requests]
+            summarize_stage(stage, model, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析服務的 Ollama 基準測試")
+    parser.add_argument("--base-url", default=None, help="預設使用 OLLAMA_BASE_URL 或 http://localhost:11434")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    layout = subparsers.add_parser("layout", help="比較提示版面的 prompt eval 時間")
+    layout.add_argument("--model", default="llama3:8b")
+    layout.add_argument("--audience", choices=sorted(PROMPT_LAYOUTS), default="user")
+    layout.add_argument("--reports", type=int, default=8, help="每種版面送出的請求數")
+    layout.add_argument("--num-predict", type=int, default=32, help="限制生成長度，聚焦於 prompt eval 時間")
+
+    stages = subparsers.add_parser("stages", help="量測各模型階段的生成延遲")
+    stages.add_argument("--stages", default="", help=f"以逗號分隔，預設全部：{','.join(MODEL_STAGES)}")
+    stages.add_argument("--models", default="", help="以逗號分隔的模型清單，每個階段逐一比較；預設使用各階段設定的模型")
+    stages.add_argument("--reports", type=int, default=4, help="每個階段、每個模型送出的請求數")
+
+    args = parser.parse_args()
+    if args.mode == "layout":
+        run_layout_benchmark(args)
+    else:
+        run_stage_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import threading
+import time
+
+
+class BrownoutController:
+    """依 LLM 准入佇列的排隊數切換降級模式：排隊數達到 enter_depth 即進入，
+    降到 exit_depth 以下且已維持至少 min_hold 秒才恢復，避免在門檻附近反覆切換。"""
+
+    def __init__(self, enter_depth=16, exit_depth=8, min_hold=30.0):
+        self.enter_depth = enter_depth
+        self.exit_depth = exit_depth
+        self.min_hold = min_hold
+        self.active = False
+        self._changed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._last_depth = 0
+        self.transitions = 0
+        self.degraded_requests = 0
+
+    def update(self, queue_depth):
+        """以目前的排隊數更新模式，回傳 (是否降級, 是否剛切換)。"""
+        with self._lock:
+            self._last_depth = queue_depth
+            now = time.monotonic()
+            changed = False
+            if not self.active and queue_depth >= self.enter_depth:
+                self.active = changed = True
+            elif (self.active and queue_depth < self.exit_depth
+                  and now - self._changed_at >= self.min_hold):
+                self.active = False
+                changed = True
+            if changed:
+                self._changed_at = now
+                self.transitions += 1
+            if self.active:
+                self.degraded_requests += 1
+            return self.active, changed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": self.active,
+                "transitions": self.transitions,
+                "degraded_requests": self.degraded_requests,
+                "queue_depth": self._last_depth,
+                "enter_depth": self.enter_depth,
+                "exit_depth": self.exit_depth,
+            }
@@ -0,0 +1,88 @@
+import hashlib
+import re
+from collections import namedtuple
+
+from context_window import estimate_tokens
+
+# 檢索到的段落：score 為向量距離（越小越相關），doc_id 為知識庫文件 ID（預設文件以類別命名）
+Passage = namedtuple("Passage", ["text", "score", "doc_id"])
+
+DEFAULT_TOKEN_BUDGET = 1200
+DEFAULT_PASSAGE_TOKENS = 300
+EMPTY_CONTEXT = "無相關參考資料"
+
+# 句子邊界：中文句末標點、分號、換行，以及英文句點後的空白
+SENTENCE_PATTERN = re.compile(r"(?<=[。！？!?；;\n])|(?<=\.\s)")
+
+
+def content_hash(text):
+    return hashlib.sha1(re.sub(r"\s+", "", text).encode("utf-8")).hexdigest()
+
+
+def truncate_chars(text, max_tokens):
+    """取 max_tokens 內最長的字元前綴（estimate_tokens 隨長度單調遞增，以二分搜尋）。"""
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def truncate_sentences(text, max_tokens):
+    """在 max_tokens 內保留完整的句子；第一句就超過時（如只以逗號分句的長回答）改為依字元截斷第一句。"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for sentence in SENTENCE_PATTERN.split(text):
+        if not sentence:
+            continue
+        tokens = estimate_tokens(sentence)
+        if used + tokens > max_tokens:
+            if not kept:
+                kept.append(truncate_chars(sentence, max_tokens))
+            break
+        kept.append(sentence)
+        used += tokens
+    return "".join(kept).strip()
+
+
+class ContextAssembler:
+    """將多個子查詢（類別檢索、HyDE）的段落合併為一份上下文：
+    依文件 ID 與內容雜湊去重、依分數排序，在 token 預算內依序填入，過長的段落在句子邊界截斷。"""
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, passage_tokens=DEFAULT_PASSAGE_TOKENS):
+        self.token_budget = token_budget
+        self.passage_tokens = passage_tokens
+
+    def deduplicate(self, passages):
+        """同一文件（或內容相同的文件）只保留分數最好的一份。"""
+        best = {}
+        ids = {}
+        for passage in passages:
+            text = passage.text.strip()
+            if not text:
+                continue
+            key = ids.get(passage.doc_id) if passage.doc_id else None
+            key = key or content_hash(text)
+            if passage.doc_id:
+                ids[passage.doc_id] = key
+            if key not in best or passage.score < best[key].score:
+                best[key] = passage._replace(text=text)
+        return list(best.values())
+
+    def assemble(self, passages):
+        remaining = self.token_budget
+        parts = []
+        for passage in sorted(self.deduplicate(passages), key=lambda passage: passage.score):
+            text = truncate_sentences(passage.text, min(self.passage_tokens, remaining))
+            if not text:
+                continue
+            parts.append(text)
+            remaining -= estimate_tokens(text)
+            if remaining <= 0:
+                break
+        return "\n".join(parts) if parts else EMPTY_CONTEXT
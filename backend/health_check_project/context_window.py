@@ -0,0 +1,82 @@
+import math
+import re
+import threading
+
+# num_ctx 分級：每次請求依提示長度選用足夠的最小級距，較小的上下文配置較少 KV 記憶體、CPU 上也較快。
+# 級距固定為少數幾個值，因為 Ollama 在 num_ctx 改變時會重新載入模型；
+# 目前級距足夠時，需連續 shrink_after 次請求都能用更小的級距才縮小，避免在兩個級距間來回重新載入。
+DEFAULT_BUCKETS = (2048, 4096, 8192)
+DEFAULT_OUTPUT_RESERVE = 1024
+DEFAULT_SHRINK_AFTER = 20
+
+# 中日韓文字（含全形標點）在 llama 系列分詞器中多為 1-2 個 token，其餘文字約 3.5 個字元一個 token；
+# 估計值刻意偏高，寧可多配置一點也不要截斷提示
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+CJK_TOKENS_PER_CHAR = 1.5
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text):
+    """不需載入分詞器的 token 數估計。"""
+    if not text:
+        return 0
+    cjk = len(CJK_PATTERN.findall(text))
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) / CHARS_PER_TOKEN)
+
+
+def parse_buckets(value):
+    """解析以逗號分隔的級距設定；空字串表示停用（沿用模型預設的 num_ctx）。"""
+    return tuple(sorted({int(bucket) for bucket in value.split(",") if bucket.strip()}))
+
+
+class ContextWindowSizer:
+    """依提示 token 數為各模型選擇 num_ctx 級距，並統計各級距的使用次數。"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, output_reserve=DEFAULT_OUTPUT_RESERVE, shrink_after=DEFAULT_SHRINK_AFTER):
+        self.buckets = tuple(sorted(buckets))
+        self.output_reserve = output_reserve
+        self.shrink_after = shrink_after
+        self._current = {}
+        self._smaller = {}
+        self._lock = threading.Lock()
+        self.counts = {bucket: 0 for bucket in self.buckets}
+        self.overflows = 0
+
+    @property
+    def enabled(self):
+        return bool(self.buckets)
+
+    def fit(self, tokens):
+        """容納 tokens 的最小級距；超過最大級距時回傳最大級距。"""
+        for bucket in self.buckets:
+            if tokens <= bucket:
+                return bucket
+        return self.buckets[-1]
+
+    def select(self, model, prompt_tokens, output_tokens=None):
+        """回傳本次請求使用的 num_ctx；停用時回傳 None。"""
+        if not self.enabled:
+            return None
+        needed = prompt_tokens + (output_tokens or self.output_reserve)
+        smallest = self.fit(needed)
+        with self._lock:
+            if needed > self.buckets[-1]:
+                self.overflows += 1
+            current = self._current.get(model)
+            if current is None or smallest > current:
+                current = smallest
+                self._smaller[model] = 0
+            elif smallest < current:
+                self._smaller[model] = self._smaller.get(model, 0) + 1
+                if self._smaller[model] >= self.shrink_after:
+                    current = smallest
+                    self._smaller[model] = 0
+            else:
+                self._smaller[model] = 0
+            self._current[model] = current
+            self.counts[current] += 1
+            return current
+
+    def stats(self):
+        with self._lock:
+            return {"buckets": dict(self.counts), "current": dict(self._current), "overflows": self.overflows}
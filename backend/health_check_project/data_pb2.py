@@ -26,7 +26,7 @@ from google.api import annotations_pb2 as google_dot_api_dot_annotations__pb2
 from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ndata.proto\x12\x06health\x1a\x1cgoogle/api/annotations.proto\x1a\x1bgoogle/protobuf/empty.proto\"T\n\x13UploadReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x19\n\x11test_results_json\x18\x03 \x01(\t\"8\n\x14UploadReportResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\'\n\x12\x43laimReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\"7\n\x13\x43laimReportResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"&\n\x11ReadReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\"=\n\x12ReadReportResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x16\n\x0ereport_content\x18\x02 \x01(\t\"1\n\x0cLoginRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"@\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\r\n\x05token\x18\x03 \x01(\t\"r\n\x13RegisterUserRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x04 \x01(\t\x12\r\n\x05\x65mail\x18\x05 \x01(\t\x12\r\n\x05phone\x18\x06 \x01(\t\"\x8a\x01\n\x16RegisterInsurerRequest\x12\x12\n\ninsurer_id\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x14\n\x0c\x63ompany_name\x18\x03 \x01(\t\x12\x16\n\x0e\x63ontact_person\x18\x04 \x01(\t\x12\r\n\x05\x65mail\x18\x05 \x01(\t\x12\r\n\x05phone\x18\x06 \x01(\t\"4\n\x10RegisterResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"m\n\x06Report\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x11\n\tclinic_id\x18\x02 \x01(\t\x12\x14\n\x0cpatient_hash\x18\x03 \x01(\t\x12\x13\n\x0bresult_json\x18\x04 \x01(\t\x12\x12\n\ncreated_at\x18\x05 \x01(\x03\"8\n\x15ListMyReportsResponse\x12\x1f\n\x07reports\x18\x01 \x03(\x0b\x32\x0e.health.Report\"]\n\x14RequestAccessRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x12\n\npatient_id\x18\x02 \x01(\t\x12\x0e\n\x06reason\x18\x03 \x01(\t\x12\x0e\n\x06\x65xpiry\x18\x04 \x01(\x03\"<\n\x15RequestAccessResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x12\n\nrequest_id\x18\x02 \x01(\t\"\xa7\x01\n\rAccessRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x11\n\treport_id\x18\x02 \x01(\t\x12\x14\n\x0cpatient_hash\x18\x03 \x01(\t\x12\x13\n\x0btarget_hash\x18\x04 \x01(\t\x12\x0e\n\x06reason\x18\x05 \x01(\t\x12\x14\n\x0crequested_at\x18\x06 \x01(\x03\x12\x0e\n\x06\x65xpiry\x18\x07 \x01(\x03\x12\x0e\n\x06status\x18\x08 \x01(\t\"E\n\x1aListAccessRequestsResponse\x12\'\n\x08requests\x18\x01 \x03(\x0b\x32\x15.health.AccessRequest\"1\n\x1b\x41pproveAccessRequestRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\"@\n\x1c\x41pproveAccessRequestResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"0\n\x1aRejectAccessRequestRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\"?\n\x1bRejectAccessRequestResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"k\n\x1dInsurerDashboardStatsResponse\x12\x18\n\x10total_authorized\x18\x01 \x01(\x05\x12\x18\n\x10pending_requests\x18\x02 \x01(\x05\x12\x16\n\x0etotal_patients\x18\x03 \x01(\x05\"h\n\x10\x41uthorizedReport\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x12\n\npatient_id\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x04 \x01(\t\x12\x0e\n\x06\x65xpiry\x18\x05 \x01(\t\"J\n\x1dListAuthorizedReportsResponse\x12)\n\x07reports\x18\x01 \x03(\x0b\x32\x18.health.AuthorizedReport\"&\n\x10PatientIDRequest\x12\x12\n\npatient_id\x18\x01 \x01(\t\"F\n\nReportMeta\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x11\n\tclinic_id\x18\x02 \x01(\t\x12\x12\n\ncreated_at\x18\x03 \x01(\x03\"=\n\x16ListReportMetaResponse\x12#\n\x07reports\x18\x01 \x03(\x0b\x32\x12.health.ReportMeta\"`\n\x1a\x41nalyzeHealthReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x14\n\x0cpatient_hash\x18\x02 \x01(\t\x12\x19\n\x11test_results_json\x18\x03 \x01(\t\"\x97\x01\n\x1aUserHealthAnalysisResponse\x12\x0f\n\x07summary\x18\x01 \x01(\t\x12\x0e\n\x06\x61\x64vice\x18\x02 \x01(\t\x12\x14\n\x07success\x18\x03 \x01(\x08H\x00\x88\x01\x01\x12\x1f\n\x12recommended_policy\x18\x04 \x01(\tH\x01\x88\x01\x01\x42\n\n\x08_successB\x15\n\x13_recommended_policy\"\xd3\x01\n\x1dInsurerHealthAnalysisResponse\x12\x0f\n\x07summary\x18\x01 \x01(\t\x12\x0f\n\x07metrics\x18\x02 \x01(\t\x12\x1b\n\x05risks\x18\x03 \x03(\x0b\x32\x0c.health.Risk\x12\x13\n\x0bpolicy_type\x18\x04 \x01(\t\x12\x14\n\x07success\x18\x05 \x01(\x08H\x00\x88\x01\x01\x12\"\n\x15insurance_suitability\x18\x06 \x01(\tH\x01\x88\x01\x01\x42\n\n\x08_successB\x18\n\x16_insurance_suitability\"<\n\x04Risk\x12\x0f\n\x07\x64isease\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\x0e\n\x06impact\x18\x03 \x01(\t*>\n\x13\x41\x63\x63\x65ssRequestStatus\x12\x0b\n\x07PENDING\x10\x00\x12\x0c\n\x08\x41PPROVED\x10\x01\x12\x0c\n\x08REJECTED\x10\x02\x32\x8e\x0e\n\rHealthService\x12`\n\x0cUploadReport\x12\x1b.health.UploadReportRequest\x1a\x1c.health.UploadReportResponse\"\x15\x82\xd3\xe4\x93\x02\x0f\"\n/v1/upload:\x01*\x12\\\n\x0b\x43laimReport\x12\x1a.health.ClaimReportRequest\x1a\x1b.health.ClaimReportResponse\"\x14\x82\xd3\xe4\x93\x02\x0e\"\t/v1/claim:\x01*\x12\x63\n\nReadReport\x12\x19.health.ReadReportRequest\x1a\x1a.health.ReadReportResponse\"\x1e\x82\xd3\xe4\x93\x02\x18\x12\x16/v1/report/{report_id}\x12J\n\x05Login\x12\x14.health.LoginRequest\x1a\x15.health.LoginResponse\"\x14\x82\xd3\xe4\x93\x02\x0e\"\t/v1/login:\x01*\x12\x63\n\x0cRegisterUser\x12\x1b.health.RegisterUserRequest\x1a\x18.health.RegisterResponse\"\x1c\x82\xd3\xe4\x93\x02\x16\"\x11/v1/register/user:\x01*\x12l\n\x0fRegisterInsurer\x12\x1e.health.RegisterInsurerRequest\x1a\x18.health.RegisterResponse\"\x1f\x82\xd3\xe4\x93\x02\x19\"\x14/v1/register/insurer:\x01*\x12[\n\rListMyReports\x12\x16.google.protobuf.Empty\x1a\x1d.health.ListMyReportsResponse\"\x13\x82\xd3\xe4\x93\x02\r\x12\x0b/v1/reports\x12k\n\rRequestAccess\x12\x1c.health.RequestAccessRequest\x1a\x1d.health.RequestAccessResponse\"\x1d\x82\xd3\xe4\x93\x02\x17\"\x12/v1/access/request:\x01*\x12m\n\x12ListAccessRequests\x12\x16.google.protobuf.Empty\x1a\".health.ListAccessRequestsResponse\"\x1b\x82\xd3\xe4\x93\x02\x15\x12\x13/v1/access/requests\x12\x80\x01\n\x14\x41pproveAccessRequest\x12#.health.ApproveAccessRequestRequest\x1a$.health.ApproveAccessRequestResponse\"\x1d\x82\xd3\xe4\x93\x02\x17\"\x12/v1/access/approve:\x01*\x12|\n\x13RejectAccessRequest\x12\".health.RejectAccessRequestRequest\x1a#.health.RejectAccessRequestResponse\"\x1c\x82\xd3\xe4\x93\x02\x16\"\x11/v1/access/reject:\x01*\x12x\n\x18GetInsurerDashboardStats\x12\x16.google.protobuf.Empty\x1a%.health.InsurerDashboardStatsResponse\"\x1d\x82\xd3\xe4\x93\x02\x17\x12\x15/v1/dashboard/summary\x12v\n\x15ListAuthorizedReports\x12\x16.google.protobuf.Empty\x1a%.health.ListAuthorizedReportsResponse\"\x1e\x82\xd3\xe4\x93\x02\x18\x12\x16/v1/reports/authorized\x12|\n\x19ListReportMetaByPatientID\x12\x18.health.PatientIDRequest\x1a\x1e.health.ListReportMetaResponse\"%\x82\xd3\xe4\x93\x02\x1f\x12\x1d/v1/reports/meta/{patient_id}\x12\x81\x01\n\x1a\x41nalyzeHealthReportForUser\x12\".health.AnalyzeHealthReportRequest\x1a\".health.UserHealthAnalysisResponse\"\x1b\x82\xd3\xe4\x93\x02\x15\"\x10/v1/analyze/user:\x01*\x12\x8a\x01\n\x1d\x41nalyzeHealthReportForInsurer\x12\".health.AnalyzeHealthReportRequest\x1a%.health.InsurerHealthAnalysisResponse\"\x1e\x82\xd3\xe4\x93\x02\x18\"\x13/v1/analyze/insurer:\x01*B\x17Z\x15sdk_test/proto;healthb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ndata.proto\x12\x06health\x1a\x1cgoogle/api/annotations.proto\x1a\x1bgoogle/protobuf/empty.proto\"T\n\x13UploadReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x19\n\x11test_results_json\x18\x03 \x01(\t\"8\n\x14UploadReportResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\'\n\x12\x43laimReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\"7\n\x13\x43laimReportResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"&\n\x11ReadReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\"=\n\x12ReadReportResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x16\n\x0ereport_content\x18\x02 \x01(\t\"1\n\x0cLoginRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"@\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\r\n\x05token\x18\x03 \x01(\t\"r\n\x13RegisterUserRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x04 \x01(\t\x12\r\n\x05\x65mail\x18\x05 \x01(\t\x12\r\n\x05phone\x18\x06 \x01(\t\"\x8a\x01\n\x16RegisterInsurerRequest\x12\x12\n\ninsurer_id\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x14\n\x0c\x63ompany_name\x18\x03 \x01(\t\x12\x16\n\x0e\x63ontact_person\x18\x04 \x01(\t\x12\r\n\x05\x65mail\x18\x05 \x01(\t\x12\r\n\x05phone\x18\x06 \x01(\t\"4\n\x10RegisterResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"m\n\x06Report\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x11\n\tclinic_id\x18\x02 \x01(\t\x12\x14\n\x0cpatient_hash\x18\x03 \x01(\t\x12\x13\n\x0bresult_json\x18\x04 \x01(\t\x12\x12\n\ncreated_at\x18\x05 \x01(\x03\"8\n\x15ListMyReportsResponse\x12\x1f\n\x07reports\x18\x01 \x03(\x0b\x32\x0e.health.Report\"]\n\x14RequestAccessRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x12\n\npatient_id\x18\x02 \x01(\t\x12\x0e\n\x06reason\x18\x03 \x01(\t\x12\x0e\n\x06\x65xpiry\x18\x04 \x01(\x03\"<\n\x15RequestAccessResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x12\n\nrequest_id\x18\x02 \x01(\t\"\xa7\x01\n\rAccessRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x11\n\treport_id\x18\x02 \x01(\t\x12\x14\n\x0cpatient_hash\x18\x03 \x01(\t\x12\x13\n\x0btarget_hash\x18\x04 \x01(\t\x12\x0e\n\x06reason\x18\x05 \x01(\t\x12\x14\n\x0crequested_at\x18\x06 \x01(\x03\x12\x0e\n\x06\x65xpiry\x18\x07 \x01(\x03\x12\x0e\n\x06status\x18\x08 \x01(\t\"E\n\x1aListAccessRequestsResponse\x12\'\n\x08requests\x18\x01 \x03(\x0b\x32\x15.health.AccessRequest\"1\n\x1b\x41pproveAccessRequestRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\"@\n\x1c\x41pproveAccessRequestResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"0\n\x1aRejectAccessRequestRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\"?\n\x1bRejectAccessRequestResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"k\n\x1dInsurerDashboardStatsResponse\x12\x18\n\x10total_authorized\x18\x01 \x01(\x05\x12\x18\n\x10pending_requests\x18\x02 \x01(\x05\x12\x16\n\x0etotal_patients\x18\x03 \x01(\x05\"h\n\x10\x41uthorizedReport\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x12\n\npatient_id\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x04 \x01(\t\x12\x0e\n\x06\x65xpiry\x18\x05 \x01(\t\"J\n\x1dListAuthorizedReportsResponse\x12)\n\x07reports\x18\x01 \x03(\x0b\x32\x18.health.AuthorizedReport\"&\n\x10PatientIDRequest\x12\x12\n\npatient_id\x18\x01 \x01(\t\"F\n\nReportMeta\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x11\n\tclinic_id\x18\x02 \x01(\t\x12\x12\n\ncreated_at\x18\x03 \x01(\x03\"=\n\x16ListReportMetaResponse\x12#\n\x07reports\x18\x01 \x03(\x0b\x32\x12.health.ReportMeta\"\x86\x01\n\x1a\x41nalyzeHealthReportRequest\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x14\n\x0cpatient_hash\x18\x02 \x01(\t\x12\x19\n\x11test_results_json\x18\x03 \x01(\t\x12\x12\n\nrisks_only\x18\x04 \x01(\x08\x12\x10\n\x08use_hyde\x18\x05 \x01(\x08\"\xbb\x01\n\x1aUserHealthAnalysisResponse\x12\x0f\n\x07summary\x18\x01 \x01(\t\x12\x0e\n\x06\x61\x64vice\x18\x02 \x01(\t\x12\x14\n\x07success\x18\x03 \x01(\x08H\x00\x88\x01\x01\x12\x1f\n\x12recommended_policy\x18\x04 \x01(\tH\x01\x88\x01\x01\x12\x15\n\x08\x62rownout\x18\x05 \x01(\x08H\x02\x88\x01\x01\x42\n\n\x08_successB\x15\n\x13_recommended_policyB\x0b\n\t_brownout\"\xf7\x01\n\x1dInsurerHealthAnalysisResponse\x12\x0f\n\x07summary\x18\x01 \x01(\t\x12\x0f\n\x07metrics\x18\x02 \x01(\t\x12\x1b\n\x05risks\x18\x03 \x03(\x0b\x32\x0c.health.Risk\x12\x13\n\x0bpolicy_type\x18\x04 \x01(\t\x12\x14\n\x07success\x18\x05 \x01(\x08H\x00\x88\x01\x01\x12\"\n\x15insurance_suitability\x18\x06 \x01(\tH\x01\x88\x01\x01\x12\x15\n\x08\x62rownout\x18\x07 \x01(\x08H\x02\x88\x01\x01\x42\n\n\x08_successB\x18\n\x16_insurance_suitabilityB\x0b\n\t_brownout\"\\\n\x17UserHealthAnalysisChunk\x12\r\n\x05token\x18\x01 \x01(\t\x12\x32\n\x06result\x18\x02 \x01(\x0b\x32\".health.UserHealthAnalysisResponse\"b\n\x1aInsurerHealthAnalysisChunk\x12\r\n\x05token\x18\x01 \x01(\t\x12\x35\n\x06result\x18\x02 \x01(\x0b\x32%.health.InsurerHealthAnalysisResponse\"W\n AnalyzeHealthReportsBatchRequest\x12\x33\n\x07reports\x18\x01 \x03(\x0b\x32\".health.AnalyzeHealthReportRequest\"e\n\x19\x42\x61tchHealthAnalysisResult\x12\x11\n\treport_id\x18\x01 \x01(\t\x12\x35\n\x06result\x18\x02 \x01(\x0b\x32%.health.InsurerHealthAnalysisResponse\"\xf8\x03\n\x12\x41nalysisQueueStats\x12\x13\n\x0bqueue_depth\x18\x01 \x01(\x05\x12\x0e\n\x06\x61\x63tive\x18\x02 \x01(\x05\x12\x16\n\x0emax_concurrent\x18\x03 \x01(\x05\x12\x11\n\tmax_queue\x18\x04 \x01(\x05\x12\x10\n\x08\x61\x64mitted\x18\x05 \x01(\x03\x12\x10\n\x08rejected\x18\x06 \x01(\x03\x12\x13\n\x0b\x61vg_wait_ms\x18\x07 \x01(\x01\x12\x14\n\x0clast_wait_ms\x18\x08 \x01(\x01\x12\x19\n\x11\x65stimated_wait_ms\x18\t \x01(\x01\x12\x10\n\x08\x62rownout\x18\n \x01(\x08\x12\x1c\n\x14\x62rownout_transitions\x18\x0b \x01(\x03\x12\x19\n\x11\x62rownout_requests\x18\x0c \x01(\x03\x12\x1c\n\x14\x62rownout_enter_depth\x18\r \x01(\x05\x12\x13\n\x0bhyde_forced\x18\x0e \x01(\x03\x12\x17\n\x0fhyde_low_recall\x18\x0f \x01(\x03\x12\x14\n\x0chyde_skipped\x18\x10 \x01(\x03\x12\x1b\n\x13response_cache_hits\x18\x11 \x01(\x03\x12\x1d\n\x15response_cache_misses\x18\x12 \x01(\x03\x12\x1f\n\x17response_cache_hit_rate\x18\x13 \x01(\x01\x12\x1e\n\x16response_cache_entries\x18\x14 \x01(\x03\"<\n\x04Risk\x12\x0f\n\x07\x64isease\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\x0e\n\x06impact\x18\x03 \x01(\t*>\n\x13\x41\x63\x63\x65ssRequestStatus\x12\x0b\n\x07PENDING\x10\x00\x12\x0c\n\x08\x41PPROVED\x10\x01\x12\x0c\n\x08REJECTED\x10\x02\x32\xa4\x12\n\rHealthService\x12`\n\x0cUploadReport\x12\x1b.health.UploadReportRequest\x1a\x1c.health.UploadReportResponse\"\x15\x82\xd3\xe4\x93\x02\x0f\"\n/v1/upload:\x01*\x12\\\n\x0b\x43laimReport\x12\x1a.health.ClaimReportRequest\x1a\x1b.health.ClaimReportResponse\"\x14\x82\xd3\xe4\x93\x02\x0e\"\t/v1/claim:\x01*\x12\x63\n\nReadReport\x12\x19.health.ReadReportRequest\x1a\x1a.health.ReadReportResponse\"\x1e\x82\xd3\xe4\x93\x02\x18\x12\x16/v1/report/{report_id}\x12J\n\x05Login\x12\x14.health.LoginRequest\x1a\x15.health.LoginResponse\"\x14\x82\xd3\xe4\x93\x02\x0e\"\t/v1/login:\x01*\x12\x63\n\x0cRegisterUser\x12\x1b.health.RegisterUserRequest\x1a\x18.health.RegisterResponse\"\x1c\x82\xd3\xe4\x93\x02\x16\"\x11/v1/register/user:\x01*\x12l\n\x0fRegisterInsurer\x12\x1e.health.RegisterInsurerRequest\x1a\x18.health.RegisterResponse\"\x1f\x82\xd3\xe4\x93\x02\x19\"\x14/v1/register/insurer:\x01*\x12[\n\rListMyReports\x12\x16.google.protobuf.Empty\x1a\x1d.health.ListMyReportsResponse\"\x13\x82\xd3\xe4\x93\x02\r\x12\x0b/v1/reports\x12k\n\rRequestAccess\x12\x1c.health.RequestAccessRequest\x1a\x1d.health.RequestAccessResponse\"\x1d\x82\xd3\xe4\x93\x02\x17\"\x12/v1/access/request:\x01*\x12m\n\x12ListAccessRequests\x12\x16.google.protobuf.Empty\x1a\".health.ListAccessRequestsResponse\"\x1b\x82\xd3\xe4\x93\x02\x15\x12\x13/v1/access/requests\x12\x80\x01\n\x14\x41pproveAccessRequest\x12#.health.ApproveAccessRequestRequest\x1a$.health.ApproveAccessRequestResponse\"\x1d\x82\xd3\xe4\x93\x02\x17\"\x12/v1/access/approve:\x01*\x12|\n\x13RejectAccessRequest\x12\".health.RejectAccessRequestRequest\x1a#.health.RejectAccessRequestResponse\"\x1c\x82\xd3\xe4\x93\x02\x16\"\x11/v1/access/reject:\x01*\x12x\n\x18GetInsurerDashboardStats\x12\x16.google.protobuf.Empty\x1a%.health.InsurerDashboardStatsResponse\"\x1d\x82\xd3\xe4\x93\x02\x17\x12\x15/v1/dashboard/summary\x12v\n\x15ListAuthorizedReports\x12\x16.google.protobuf.Empty\x1a%.health.ListAuthorizedReportsResponse\"\x1e\x82\xd3\xe4\x93\x02\x18\x12\x16/v1/reports/authorized\x12|\n\x19ListReportMetaByPatientID\x12\x18.health.PatientIDRequest\x1a\x1e.health.ListReportMetaResponse\"%\x82\xd3\xe4\x93\x02\x1f\x12\x1d/v1/reports/meta/{patient_id}\x12\x81\x01\n\x1a\x41nalyzeHealthReportForUser\x12\".health.AnalyzeHealthReportRequest\x1a\".health.UserHealthAnalysisResponse\"\x1b\x82\xd3\xe4\x93\x02\x15\"\x10/v1/analyze/user:\x01*\x12\x8a\x01\n\x1d\x41nalyzeHealthReportForInsurer\x12\".health.AnalyzeHealthReportRequest\x1a%.health.InsurerHealthAnalysisResponse\"\x1e\x82\xd3\xe4\x93\x02\x18\"\x13/v1/analyze/insurer:\x01*\x12\x86\x01\n\x19StreamHealthReportForUser\x12\".health.AnalyzeHealthReportRequest\x1a\x1f.health.UserHealthAnalysisChunk\"\"\x82\xd3\xe4\x93\x02\x1c\"\x17/v1/analyze/user/stream:\x01*0\x01\x12\x8f\x01\n\x1cStreamHealthReportForInsurer\x12\".health.AnalyzeHealthReportRequest\x1a\".health.InsurerHealthAnalysisChunk\"%\x82\xd3\xe4\x93\x02\x1f\"\x1a/v1/analyze/insurer/stream:\x01*0\x01\x12\x90\x01\n\x19\x41nalyzeHealthReportsBatch\x12(.health.AnalyzeHealthReportsBatchRequest\x1a!.health.BatchHealthAnalysisResult\"$\x82\xd3\xe4\x93\x02\x1e\"\x19/v1/analyze/insurer/batch:\x01*0\x01\x12\x66\n\x15GetAnalysisQueueStats\x12\x16.google.protobuf.Empty\x1a\x1a.health.AnalysisQueueStats\"\x19\x82\xd3\xe4\x93\x02\x13\x12\x11/v1/analyze/statsB\x17Z\x15sdk_test/proto;healthb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -66,8 +66,16 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_HEALTHSERVICE'].methods_by_name['AnalyzeHealthReportForUser']._serialized_options = b'\202\323\344\223\002\025\"\020/v1/analyze/user:\001*'
   _globals['_HEALTHSERVICE'].methods_by_name['AnalyzeHealthReportForInsurer']._loaded_options = None
   _globals['_HEALTHSERVICE'].methods_by_name['AnalyzeHealthReportForInsurer']._serialized_options = b'\202\323\344\223\002\030\"\023/v1/analyze/insurer:\001*'
-  _globals['_ACCESSREQUESTSTATUS']._serialized_start=2647
-  _globals['_ACCESSREQUESTSTATUS']._serialized_end=2709
+  _globals['_HEALTHSERVICE'].methods_by_name['StreamHealthReportForUser']._loaded_options = None
+  _globals['_HEALTHSERVICE'].methods_by_name['StreamHealthReportForUser']._serialized_options = b'\202\323\344\223\002\034\"\027/v1/analyze/user/stream:\001*'
+  _globals['_HEALTHSERVICE'].methods_by_name['StreamHealthReportForInsurer']._loaded_options = None
+  _globals['_HEALTHSERVICE'].methods_by_name['StreamHealthReportForInsurer']._serialized_options = b'\202\323\344\223\002\037\"\032/v1/analyze/insurer/stream:\001*'
+  _globals['_HEALTHSERVICE'].methods_by_name['AnalyzeHealthReportsBatch']._loaded_options = None
+  _globals['_HEALTHSERVICE'].methods_by_name['AnalyzeHealthReportsBatch']._serialized_options = b'\202\323\344\223\002\036\"\031/v1/analyze/insurer/batch:\001*'
+  _globals['_HEALTHSERVICE'].methods_by_name['GetAnalysisQueueStats']._loaded_options = None
+  _globals['_HEALTHSERVICE'].methods_by_name['GetAnalysisQueueStats']._serialized_options = b'\202\323\344\223\002\023\022\021/v1/analyze/stats'
+  _globals['_ACCESSREQUESTSTATUS']._serialized_start=3651
+  _globals['_ACCESSREQUESTSTATUS']._serialized_end=3713
   _globals['_UPLOADREPORTREQUEST']._serialized_start=81
   _globals['_UPLOADREPORTREQUEST']._serialized_end=165
   _globals['_UPLOADREPORTRESPONSE']._serialized_start=167
@@ -122,14 +130,24 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_REPORTMETA']._serialized_end=2054
   _globals['_LISTREPORTMETARESPONSE']._serialized_start=2056
   _globals['_LISTREPORTMETARESPONSE']._serialized_end=2117
-  _globals['_ANALYZEHEALTHREPORTREQUEST']._serialized_start=2119
-  _globals['_ANALYZEHEALTHREPORTREQUEST']._serialized_end=2215
-  _globals['_USERHEALTHANALYSISRESPONSE']._serialized_start=2218
-  _globals['_USERHEALTHANALYSISRESPONSE']._serialized_end=2369
-  _globals['_INSURERHEALTHANALYSISRESPONSE']._serialized_start=2372
-  _globals['_INSURERHEALTHANALYSISRESPONSE']._serialized_end=2583
-  _globals['_RISK']._serialized_start=2585
-  _globals['_RISK']._serialized_end=2645
-  _globals['_HEALTHSERVICE']._serialized_start=2712
-  _globals['_HEALTHSERVICE']._serialized_end=4518
+  _globals['_ANALYZEHEALTHREPORTREQUEST']._serialized_start=2120
+  _globals['_ANALYZEHEALTHREPORTREQUEST']._serialized_end=2254
+  _globals['_USERHEALTHANALYSISRESPONSE']._serialized_start=2257
+  _globals['_USERHEALTHANALYSISRESPONSE']._serialized_end=2444
+  _globals['_INSURERHEALTHANALYSISRESPONSE']._serialized_start=2447
+  _globals['_INSURERHEALTHANALYSISRESPONSE']._serialized_end=2694
+  _globals['_USERHEALTHANALYSISCHUNK']._serialized_start=2696
+  _globals['_USERHEALTHANALYSISCHUNK']._serialized_end=2788
+  _globals['_INSURERHEALTHANALYSISCHUNK']._serialized_start=2790
+  _globals['_INSURERHEALTHANALYSISCHUNK']._serialized_end=2888
+  _globals['_ANALYZEHEALTHREPORTSBATCHREQUEST']._serialized_start=2890
+  _globals['_ANALYZEHEALTHREPORTSBATCHREQUEST']._serialized_end=2977
+  _globals['_BATCHHEALTHANALYSISRESULT']._serialized_start=2979
+  _globals['_BATCHHEALTHANALYSISRESULT']._serialized_end=3080
+  _globals['_ANALYSISQUEUESTATS']._serialized_start=3083
+  _globals['_ANALYSISQUEUESTATS']._serialized_end=3587
+  _globals['_RISK']._serialized_start=3589
+  _globals['_RISK']._serialized_end=3649
+  _globals['_HEALTHSERVICE']._serialized_start=3716
+  _globals['_HEALTHSERVICE']._serialized_end=6056
 # @@protoc_insertion_point(module_scope)
@@ -115,6 +115,26 @@ class HealthServiceStub(object):
                 request_serializer=data__pb2.AnalyzeHealthReportRequest.SerializeToString,
                 response_deserializer=data__pb2.InsurerHealthAnalysisResponse.FromString,
                 _registered_method=True)
+        self.StreamHealthReportForUser = channel.unary_stream(
+                '/health.HealthService/StreamHealthReportForUser',
+                request_serializer=data__pb2.AnalyzeHealthReportRequest.SerializeToString,
+                response_deserializer=data__pb2.UserHealthAnalysisChunk.FromString,
+                _registered_method=True)
+        self.StreamHealthReportForInsurer = channel.unary_stream(
+                '/health.HealthService/StreamHealthReportForInsurer',
+                request_serializer=data__pb2.AnalyzeHealthReportRequest.SerializeToString,
+                response_deserializer=data__pb2.InsurerHealthAnalysisChunk.FromString,
+                _registered_method=True)
+        self.AnalyzeHealthReportsBatch = channel.unary_stream(
+                '/health.HealthService/AnalyzeHealthReportsBatch',
+                request_serializer=data__pb2.AnalyzeHealthReportsBatchRequest.SerializeToString,
+                response_deserializer=data__pb2.BatchHealthAnalysisResult.FromString,
+                _registered_method=True)
+        self.GetAnalysisQueueStats = channel.unary_unary(
+                '/health.HealthService/GetAnalysisQueueStats',
+                request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+                response_deserializer=data__pb2.AnalysisQueueStats.FromString,
+                _registered_method=True)
 
 
 class HealthServiceServicer(object):
@@ -218,6 +238,34 @@ class HealthServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamHealthReportForUser(self, request, context):
+        """給用戶的健康報告分析（串流回傳 LLM 生成內容）
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamHealthReportForInsurer(self, request, context):
+        """給保險公司的健康報告分析（串流回傳 LLM 生成內容）
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AnalyzeHealthReportsBatch(self, request, context):
+        """保險公司批次分析多份報告，依完成順序串流回傳各報告結果
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetAnalysisQueueStats(self, request, context):
+        """分析服務的 LLM 佇列狀態（供負載平衡器判斷負載）
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_HealthServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -301,6 +349,26 @@ def add_HealthServiceServicer_to_server(servicer, server):
                     request_deserializer=data__pb2.AnalyzeHealthReportRequest.FromString,
                     response_serializer=data__pb2.InsurerHealthAnalysisResponse.SerializeToString,
             ),
+            'StreamHealthReportForUser': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamHealthReportForUser,
+                    request_deserializer=data__pb2.AnalyzeHealthReportRequest.FromString,
+                    response_serializer=data__pb2.UserHealthAnalysisChunk.SerializeToString,
+            ),
+            'StreamHealthReportForInsurer': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamHealthReportForInsurer,
+                    request_deserializer=data__pb2.AnalyzeHealthReportRequest.FromString,
+                    response_serializer=data__pb2.InsurerHealthAnalysisChunk.SerializeToString,
+            ),
+            'AnalyzeHealthReportsBatch': grpc.unary_stream_rpc_method_handler(
+                    servicer.AnalyzeHealthReportsBatch,
+                    request_deserializer=data__pb2.AnalyzeHealthReportsBatchRequest.FromString,
+                    response_serializer=data__pb2.BatchHealthAnalysisResult.SerializeToString,
+            ),
+            'GetAnalysisQueueStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetAnalysisQueueStats,
+                    request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+                    response_serializer=data__pb2.AnalysisQueueStats.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'health.HealthService', rpc_method_handlers)
@@ -743,3 +811,111 @@ class HealthService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def StreamHealthReportForUser(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/health.HealthService/StreamHealthReportForUser',
+            data__pb2.AnalyzeHealthReportRequest.SerializeToString,
+            data__pb2.UserHealthAnalysisChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamHealthReportForInsurer(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/health.HealthService/StreamHealthReportForInsurer',
+            data__pb2.AnalyzeHealthReportRequest.SerializeToString,
+            data__pb2.InsurerHealthAnalysisChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AnalyzeHealthReportsBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/health.HealthService/AnalyzeHealthReportsBatch',
+            data__pb2.AnalyzeHealthReportsBatchRequest.SerializeToString,
+            data__pb2.BatchHealthAnalysisResult.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetAnalysisQueueStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/health.HealthService/GetAnalysisQueueStats',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            data__pb2.AnalysisQueueStats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
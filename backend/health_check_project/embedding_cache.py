@@ -0,0 +1,140 @@
+import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+# 查詢嵌入快取：類別子查詢、id_number 查詢與重複的互動問題在 CPU 上反覆計算嵌入，
+# 記憶體層為 LRU，磁碟層（EMBEDDING_CACHE_PATH，空字串表示停用）在重新啟動後仍可沿用
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """以 SQLite 儲存的嵌入向量（float32），以 (模型名稱, 文字雜湊) 為鍵，超過 max_entries 時淘汰最久未存取的項目。"""
+
+    def __init__(self, path, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_accessed_at ON embeddings (accessed_at)")
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        found = {}
+        with self._lock:
+            for digest in hashes:
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?", (model, digest)
+                ).fetchone()
+                if row is not None:
+                    found[digest] = array.array("f", row[0]).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, digest) for digest in found]
+                )
+                self._conn.commit()
+        return found
+
+    def set_many(self, model, vectors):
+        if not vectors:
+            return
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, accessed_at) VALUES (?, ?, ?, ?)",
+                [(model, digest, array.array("f", vector).tobytes(), now) for digest, vector in vectors.items()]
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """包裝嵌入模型的查詢嵌入快取：先查記憶體 LRU，再查磁碟層，其餘查詢以單次批次前向計算後回寫兩層快取。
+
+    embed_documents 用於知識庫寫入，文件通常只嵌入一次，直接交給底層模型，避免大量文件把查詢擠出 LRU。"""
+
+    def __init__(self, embedding, model_name=None, max_size=EMBEDDING_CACHE_SIZE, path=EMBEDDING_CACHE_PATH):
+        self.embedding = embedding
+        self.model_name = model_name or getattr(embedding, "model_name", type(embedding).__name__)
+        self.max_size = max_size
+        self.store = EmbeddingStore(path) if path else None
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        """依輸入順序回傳各查詢的嵌入向量；重複的查詢只計算一次。"""
+        digests = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for digest in digests:
+                vector = self._items.get(digest)
+                if vector is not None:
+                    self._items.move_to_end(digest)
+                    found[digest] = vector
+            self.hits += sum(1 for digest in digests if digest in found)
+        missing = {digest: text for digest, text in zip(digests, texts) if digest not in found}
+        if missing and self.store is not None:
+            stored = self.store.get_many(self.model_name, list(missing))
+            self.disk_hits += sum(1 for digest in digests if digest in stored)
+            found.update(stored)
+            self._remember(stored)
+            missing = {digest: text for digest, text in missing.items() if digest not in stored}
+        if missing:
+            computed = dict(zip(missing, self.embedding.embed_documents(list(missing.values()))))
+            self.misses += sum(1 for digest in digests if digest in computed)
+            found.update(computed)
+            self._remember(computed)
+            if self.store is not None:
+                self.store.set_many(self.model_name, computed)
+        return [list(found[digest]) for digest in digests]
+
+    def _remember(self, vectors):
+        with self._lock:
+            for digest, vector in vectors.items():
+                self._items[digest] = vector
+                self._items.move_to_end(digest)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._items)
+        return {
+            "model": self.model_name, "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+            "entries": entries, "disk_entries": len(self.store) if self.store is not None else 0
+        }
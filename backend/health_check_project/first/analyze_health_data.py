@@ -14,6 +14,12 @@ from datetime import datetime
 import logging
 import uvicorn
 import os
+import sys
+
+# 共用模組（llm_gateway 等）位於上層的 health_check_project 目錄
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_gateway import get_gateway
+from model_registry import INTERACTIVE_QUERY
 
 # 初始化 FastAPI 應用
 app = FastAPI()
@@ -486,6 +492,21 @@ def extract_health_data(db_config: Dict[str, Any], id_number: str) -> tuple[Opti
     except Exception as e:
         return None, f"連線 Azure SQL Database 時發生錯誤: {str(e)}"
 
+# 提示模板與 chain 在模組載入時建立一次，所有請求共用（LLM 呼叫經由共用的 LLM 閘道）
+analysis_prompt_template = PromptTemplate(
+    input_variables=["data"],
+    template="你是一個專業的健康分析專家，請嚴格以繁體中文回答，不得使用英文或其他語言，所有醫學名詞必須使用繁體中文（例如使用「收縮壓」代替「systolic blood pressure」，使用「舒張壓」代替「diastolic blood pressure」）。請分析以下健檢資料並提供詳細建議：\n\n{data}\n\n請提供清晰的分析，包括每個指標是否正常（明確說明正常範圍，例如血壓正常範圍為90-120/60-80 mmHg，心率正常範圍為60-100 bpm），並給出至少三項具體的健康建議（例如飲食調整、運動建議、醫療檢查）和至少一項潛在疾病風險（例如高血壓可能導致心血管疾病）。所有回答必須是繁體中文。"
+)
+
+interactive_prompt_template = PromptTemplate(
+    input_variables=["query"],
+    template="你是一個專業的健康分析專家，請嚴格以繁體中文回答，不得使用英文或其他語言，所有醫學名詞必須使用繁體中文（例如使用「收縮壓」代替「systolic blood pressure」，使用「舒張壓」代替「diastolic blood pressure」）。基於之前的健檢資料和上下文，回答以下問題並提供新的具體建議：\n\n{query}\n\n請避免重複之前的回應，確保建議清晰實用，並提供至少三項具體行動建議和至少一項潛在疾病風險。所有回答必須是繁體中文。"
+)
+
+gateway = get_gateway()
+gateway.register("health_analysis", analysis_prompt_template, stage=INTERACTIVE_QUERY)
+gateway.register("health_interactive", interactive_prompt_template, stage=INTERACTIVE_QUERY)
+
 # 分析健檢資料
 def analyze_health_data(db_config: Dict[str, Any], id_number: str) -> tuple[Dict[str, Any], Optional[OllamaLLM], Optional[ConversationBufferMemory], Optional[PromptTemplate]]:
     """分析健檢資料並提供建議。
@@ -502,17 +523,7 @@ def analyze_health_data(db_config: Dict[str, Any], id_number: str) -> tuple[Dict
     """
     memory = ConversationBufferMemory()
 
-    llm = OllamaLLM(model="llama3:8b", base_url="http://localhost:11434", temperature=0.3)
-
-    analysis_prompt_template = PromptTemplate(
-        input_variables=["data"],
-        template="你是一個專業的健康分析專家，請嚴格以繁體中文回答，不得使用英文或其他語言，所有醫學名詞必須使用繁體中文（例如使用「收縮壓」代替「systolic blood pressure」，使用「舒張壓」代替「diastolic blood pressure」）。請分析以下健檢資料並提供詳細建議：\n\n{data}\n\n請提供清晰的分析，包括每個指標是否正常（明確說明正常範圍，例如血壓正常範圍為90-120/60-80 mmHg，心率正常範圍為60-100 bpm），並給出至少三項具體的健康建議（例如飲食調整、運動建議、醫療檢查）和至少一項潛在疾病風險（例如高血壓可能導致心血管疾病）。所有回答必須是繁體中文。"
-    )
-
-    interactive_prompt_template = PromptTemplate(
-        input_variables=["query"],
-        template="你是一個專業的健康分析專家，請嚴格以繁體中文回答，不得使用英文或其他語言，所有醫學名詞必須使用繁體中文（例如使用「收縮壓」代替「systolic blood pressure」，使用「舒張壓」代替「diastolic blood pressure」）。基於之前的健檢資料和上下文，回答以下問題並提供新的具體建議：\n\n{query}\n\n請避免重複之前的回應，確保建議清晰實用，並提供至少三項具體行動建議和至少一項潛在疾病風險。所有回答必須是繁體中文。"
-    )
+    llm = gateway.llm(INTERACTIVE_QUERY)
 
     health_data, error = extract_health_data(db_config, id_number)
     if error:
@@ -521,8 +532,7 @@ def analyze_health_data(db_config: Dict[str, Any], id_number: str) -> tuple[Dict
     memory.save_context({"input": "健檢資料"}, {"output": health_data})
 
     try:
-        analysis_prompt = analysis_prompt_template.format(data=health_data)
-        result = llm.invoke(analysis_prompt)
+        result = gateway.invoke("health_analysis", {"data": health_data})
         return {
             "health_data": health_data,
             "analysis_result": result
@@ -659,8 +669,7 @@ async def interact_health_check(request: Request, data: InteractiveRequest):
         raise HTTPException(status_code=400, detail="請先呼叫 /health-check/other/{id_number} 來初始化互動模式")
     
     try:
-        interactive_prompt = request.state.interactive_prompt_template.format(query=data.query)
-        response = request.state.llm.invoke(interactive_prompt)
+        response = gateway.invoke("health_interactive", {"query": data.query})
         logger.info("互動模式請求成功")
         return {"response": response}
     except Exception as e:
@@ -19,7 +19,7 @@ load_dotenv()
 from main import (
     CustomOAuth2PasswordRequestForm, RegisterRequest, LoginRequest, ForgotPasswordRequest, InteractiveRequest,
     validate_id_number, register_user, login_user, forgot_password, upload_health_check,
-    analyze_health_data, get_user_info, interactive_query,
+    analyze_health_data, get_user_info, interactive_query, cache_stats,
     ROLE_USER, ROLE_OTHER, ROLE_HEALTH_CENTER, VALID_ROLES
 )
 
@@ -442,6 +442,14 @@ async def interact_health_check(data: InteractiveRequest, current_user: dict = D
         logger.error(f"處理互動問題時發生錯誤: 查詢={data.query}, 錯誤={str(e)}")
         raise HTTPException(status_code=500, detail=f"處理互動問題時發生錯誤: {str(e)}")
 
+# API 端點：互動模式的快取命中統計（other 和 health_center 角色）
+@api_router.get("/health-check/other/interact/stats")
+async def interact_cache_stats(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in [ROLE_OTHER, ROLE_HEALTH_CENTER]:
+        logger.error(f"權限不足: 當前用戶角色為 {current_user['role']}，此端點僅限 other 和 health_center 角色")
+        raise HTTPException(status_code=403, detail="權限不足，此端點僅限 other 和 health_center 角色")
+    return cache_stats()
+
 # 將路由器包含到應用中
 app.include_router(api_router, prefix="/default")
 
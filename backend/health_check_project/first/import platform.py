@@ -1,5 +1,4 @@
 import pymssql
-from langchain_ollama import OllamaLLM
 from langchain.prompts import PromptTemplate
 from langchain_core.memory import ConversationBufferMemory
 from fastapi import HTTPException, UploadFile, File
@@ -13,6 +12,13 @@ from datetime import datetime
 import logging
 import pyodbc
 import platform
+import os
+import sys
+
+# 共用模組（llm_gateway 等）位於上層的 health_check_project 目錄
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_gateway import get_gateway
+from model_registry import INTERACTIVE_QUERY
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
@@ -207,26 +213,32 @@ def extract_health_data(id_number: str):
         logger.error(f"提取健檢資料時發生錯誤: {e}")
         return {"health_data": None, "error": f"連線錯誤：{e}"}
 
+# 提示模板與 chain 在模組載入時建立一次，所有請求共用（LLM 呼叫經由共用的 LLM 閘道）
+analysis_prompt_template = PromptTemplate(
+    input_variables=["data"],
+    template="你是一個專業的健康分析專家，請以繁體中文分析以下健檢資料並提供建議：\n\n{data}\n\n分析每個指標是否正常並給出至少三項建議和一項潛在風險。"
+)
+interactive_prompt_template = PromptTemplate(
+    input_variables=["query"],
+    template="你是一個專業的健康分析專家，根據之前的健檢資料，回答以下問題：\n\n{query}"
+)
+gateway = get_gateway()
+gateway.register("platform_health_analysis", analysis_prompt_template, stage=INTERACTIVE_QUERY)
+gateway.register(
+    "platform_connection_test", PromptTemplate(input_variables=[], template="你好，這是一個測試。"), stage=INTERACTIVE_QUERY
+)
+
 # 分析健檢資料
 def analyze_health_data(id_number: str):
     memory = ConversationBufferMemory()
-    llm = OllamaLLM(model="llama3:8b", base_url="http://localhost:11434", temperature=0.3)
-    analysis_prompt_template = PromptTemplate(
-        input_variables=["data"],
-        template="你是一個專業的健康分析專家，請以繁體中文分析以下健檢資料並提供建議：\n\n{data}\n\n分析每個指標是否正常並給出至少三項建議和一項潛在風險。"
-    )
-    interactive_prompt_template = PromptTemplate(
-        input_variables=["query"],
-        template="你是一個專業的健康分析專家，根據之前的健檢資料，回答以下問題：\n\n{query}"
-    )
+    llm = gateway.llm(INTERACTIVE_QUERY)
     health_data_response = extract_health_data(id_number)
     health_data = health_data_response["health_data"]
     if health_data_response["error"]:
         return None, llm, memory, interactive_prompt_template
     memory.save_context({"input": "健檢資料"}, {"output": health_data})
     try:
-        analysis_prompt = analysis_prompt_template.format(data=health_data)
-        result = llm.invoke(analysis_prompt)
+        result = gateway.invoke("platform_health_analysis", {"data": health_data})
         return {"health_data": health_data, "analysis_result": result, "id_number": id_number}, llm, memory, interactive_prompt_template
     except Exception as e:
         logger.error(f"分析健檢資料時發生錯誤: {e}")
@@ -386,8 +398,7 @@ def test_db_connection():
 # 測試 Ollama 連線
 def test_ollama_connection():
     try:
-        llm = OllamaLLM(model="llama3:8b", base_url="http://localhost:11434", temperature=0.3)
-        result = llm.invoke("你好，這是一個測試。")
+        result = gateway.invoke("platform_connection_test", {})
         logger.info(f"Ollama 連線測試成功: {result}")
         return True
     except Exception as e:
@@ -1,7 +1,6 @@
 import math
 from tqdm import tqdm
 import pymssql
-from langchain_ollama import OllamaLLM
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
 from langchain_chroma import Chroma
@@ -20,6 +19,15 @@ import os
 import shutil
 from tenacity import retry, stop_after_attempt, wait_fixed
 from dotenv import load_dotenv
+import sys
+
+# 共用模組（llm_gateway、model_registry 等）位於上層的 health_check_project 目錄
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_gateway import get_gateway
+from embedding_cache import CachedEmbeddings
+from retrieval_cache import KnowledgeBaseVersion, RetrievalCache
+from answer_cache import SemanticAnswerCache
+from model_registry import INTERACTIVE_QUERY
 
 # 載入 .env 檔案
 load_dotenv()
@@ -37,8 +45,8 @@ ROLE_OTHER = "other"
 ROLE_HEALTH_CENTER = "health_center"
 VALID_ROLES = [ROLE_USER, ROLE_OTHER, ROLE_HEALTH_CENTER]
 
-# 初始化嵌入模型
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# 初始化嵌入模型（查詢嵌入經由快取）
+embedding_model = CachedEmbeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"))
 
 # 初始化 Chroma 向量資料庫
 try:
@@ -61,6 +69,12 @@ except Exception as e:
     )
     logger.info("Chroma 向量數據庫重新初始化成功")
 
+# 檢索結果快取：知識庫版本計數器存放在 Chroma 資料夾中，populate_vectorstore 寫入後遞增
+kb_version = KnowledgeBaseVersion("./chroma_db")
+retrieval_cache = RetrievalCache(vectorstore, kb_version)
+# 互動問答的語意快取（僅用於不含身分證字號的一般問題）
+answer_cache = SemanticAnswerCache(embedding_model)
+
 # 自定義表單類，用於簡化 OAuth2 登入表單
 class CustomOAuth2PasswordRequestForm(BaseModel):
     username: str
@@ -351,13 +365,10 @@ def retrieve_health_data(db_config: Dict[str, Any], id_number: str, start_date:
         logger.error(f"檢索健康檢查數據時發生錯誤: id_number={id_number}, 錯誤: {str(e)}")
         raise Exception(f"檢索健康檢查數據時發生錯誤: {str(e)}")
 
-# 初始化 LLM
-llm = OllamaLLM(
-    model="llama3:8b",
-    base_url="http://localhost:11434",
-    temperature=0.3,
-    system_prompt="你是一位醫療助理，專門為台灣用戶提供服務。請始終使用繁體中文回答，並確保回答專業且易於理解。"
-)
+# 初始化 LLM：健康數據分析與互動問答使用 interactive_query 階段的模型（見 model_registry）；
+# 設定 OLLAMA_BASE_URLS 時由後端池分派到多個 Ollama 執行個體。所有呼叫經由共用的 LLM 閘道
+gateway = get_gateway()
+llm = gateway.llm(INTERACTIVE_QUERY)
 
 # 定義分析提示模板
 analysis_prompt_template = PromptTemplate(
@@ -393,6 +404,10 @@ interactive_prompt_template = PromptTemplate(
     """
 )
 
+# 預先建立 chain，請求時只傳入變數
+gateway.register("main_health_analysis", analysis_prompt_template, stage=INTERACTIVE_QUERY)
+gateway.register("main_interactive_query", interactive_prompt_template, stage=INTERACTIVE_QUERY)
+
 # 獲取用戶資訊
 def get_user_info(db_config: Dict[str, Any], id_number: str) -> Optional[Dict[str, Any]]:
     try:
@@ -541,7 +556,7 @@ def analyze_health_data(db_config: Dict[str, Any], id_number: str, start_date: O
     # 檢索相關醫療知識
     try:
         query = f"id_number: {id_number}"
-        retrieved_docs = vectorstore.similarity_search(query, k=3)
+        retrieved_docs = retrieval_cache.similarity_search(query, k=3)
         retrieved_context = ""
         for doc in retrieved_docs:
             retrieved_context += f"{doc.page_content}\n\n"
@@ -551,8 +566,9 @@ def analyze_health_data(db_config: Dict[str, Any], id_number: str, start_date: O
 
     # 使用 LLM 進行分析
     try:
-        prompt = analysis_prompt_template.format(health_data=health_data_str, retrieved_context=retrieved_context)
-        analysis_result = llm.invoke(prompt)
+        analysis_result = gateway.invoke(
+            "main_health_analysis", {"health_data": health_data_str, "retrieved_context": retrieved_context}
+        )
         logger.info(f"成功分析健康數據: id_number={id_number}")
     except Exception as e:
         logger.error(f"LLM 分析健康數據時發生錯誤: id_number={id_number}, 錯誤: {str(e)}")
@@ -575,6 +591,18 @@ def interactive_query(db_config: Dict[str, Any], query: str) -> Dict[str, Any]:
             id_number = word
             break
 
+    # 不含身分證字號的一般問題先查語意快取，措辭相近的問題直接回傳先前的回答
+    if not id_number:
+        try:
+            cached = answer_cache.lookup(query, kb_version.current())
+        except Exception as e:
+            logger.error(f"查詢語意快取時發生錯誤: query={query}, 錯誤: {str(e)}")
+            cached = None
+        if cached is not None:
+            answer, similarity = cached
+            logger.info(f"語意快取命中: query={query}, 相似度={similarity:.3f}, 命中率={answer_cache.stats()['hit_rate']:.1%}")
+            return {"query": query, **answer}
+
     # 檢索相關健康數據（如果有身分證字號）
     health_data_str = ""
     if id_number:
@@ -583,14 +611,16 @@ def interactive_query(db_config: Dict[str, Any], query: str) -> Dict[str, Any]:
             health_data_str += f"檢查日期: {record['check_date']}\n提取的文本: {record['extracted_text']}\n\n"
 
     # 檢索相關醫療知識
+    cacheable = not id_number
     try:
-        retrieved_docs = vectorstore.similarity_search(query, k=3)
+        retrieved_docs = retrieval_cache.similarity_search(query, k=3)
         retrieved_context = ""
         for doc in retrieved_docs:
             retrieved_context += f"{doc.page_content}\n\n"
     except Exception as e:
         logger.error(f"檢索醫療知識時發生錯誤: query={query}, 錯誤: {str(e)}")
         retrieved_context = "無法檢索相關醫療知識。"
+        cacheable = False
 
     # 使用 LLM 生成回答
     try:
@@ -598,12 +628,21 @@ def interactive_query(db_config: Dict[str, Any], query: str) -> Dict[str, Any]:
             query_with_data = f"{query}\n\n相關健康數據:\n{health_data_str}"
         else:
             query_with_data = query
-        prompt = interactive_prompt_template.format(query=query_with_data, retrieved_context=retrieved_context)
-        response = llm.invoke(prompt)
+        response = gateway.invoke(
+            "main_interactive_query", {"query": query_with_data, "retrieved_context": retrieved_context}
+        )
         logger.info(f"成功處理互動查詢: query={query}")
     except Exception as e:
         logger.error(f"LLM 處理互動查詢時發生錯誤: query={query}, 錯誤: {str(e)}")
         response = "無法處理您的查詢，請稍後再試。"
+        cacheable = False
+
+    # 檢索與生成都成功的回答才寫入語意快取
+    if cacheable:
+        try:
+            answer_cache.store(query, {"response": response, "retrieved_context": retrieved_context}, kb_version.current())
+        except Exception as e:
+            logger.error(f"寫入語意快取時發生錯誤: query={query}, 錯誤: {str(e)}")
 
     return {
         "query": query,
@@ -611,6 +650,14 @@ def interactive_query(db_config: Dict[str, Any], query: str) -> Dict[str, Any]:
         "retrieved_context": retrieved_context
     }
 
+# 查詢嵌入、檢索結果與互動問答語意快取的命中統計
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "answers": answer_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "embeddings": embedding_model.stats()
+    }
+
 # 填充向量數據庫（知識庫）
 def populate_vectorstore(db_config: Dict[str, Any], medical_data_path: str = None, dialogue_data_path: str = None):
     global vectorstore  # 聲明使用全域變數 vectorstore
@@ -674,6 +721,7 @@ def populate_vectorstore(db_config: Dict[str, Any], medical_data_path: str = Non
                                     batch = medical_docs[i:i + max_batch_size]
                                     try:
                                         vectorstore.add_documents(batch)
+                                        kb_version.bump()
                                         pbar.update(len(batch))
                                     except Exception as e:
                                         logger.warning(f"處理批次 {i//max_batch_size + 1} 時發生錯誤: {str(e)}")
@@ -738,6 +786,7 @@ def populate_vectorstore(db_config: Dict[str, Any], medical_data_path: str = Non
                                     batch = dialogue_docs[i:i + max_batch_size]
                                     try:
                                         vectorstore.add_documents(batch)
+                                        kb_version.bump()
                                         pbar.update(len(batch))
                                     except Exception as e:
                                         logger.warning(f"處理批次 {i//max_batch_size + 1} 時發生錯誤: {str(e)}")
@@ -782,6 +831,7 @@ def populate_vectorstore(db_config: Dict[str, Any], medical_data_path: str = Non
         if new_documents:
             logger.info(f"準備將 {len(new_documents)} 筆新的健康檢查數據加入知識庫")
             vectorstore.add_documents(new_documents)
+            kb_version.bump()
             logger.info(f"成功將 {len(new_documents)} 筆新的健康檢查數據加入知識庫")
         else:
             logger.info("沒有新的健康檢查數據需要載入")
@@ -0,0 +1,100 @@
+import json
+
+
+class StreamingJSONParser:
+    """逐段接收 LLM 輸出並追蹤括號巢狀深度（忽略字串內的括號與跳脫字元），
+    頂層 JSON 物件閉合且可解析時即完成，呼叫端可據此提前停止生成。"""
+
+    def __init__(self):
+        self.raw = []
+        self._object = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+        self.value = None
+
+    def feed(self, chunk):
+        """餵入一段文字，頂層物件完成時回傳 True，之後的輸入一律忽略。"""
+        if self.done or not chunk:
+            return self.done
+        self.raw.append(chunk)
+        return self._scan(chunk)
+
+    def finish(self):
+        """輸入結束時呼叫：候選物件始終未閉合（例如前綴說明文字中有落單的「{」）時，
+        從該候選起點之後的下一個「{」重新尋找。"""
+        while not self.done and self._depth > 0:
+            self._scan(self._restart())
+        return self.done
+
+    def _restart(self):
+        """捨棄目前候選物件的起點，回傳需重新掃描的文字。"""
+        text = "".join(self._object[1:])
+        self._object = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        return text
+
+    def _scan(self, text):
+        while text:
+            text = self._consume(text)
+        return self.done
+
+    def _consume(self, text):
+        """掃描 text；候選物件閉合卻無法解析時回傳需重新掃描的文字，否則回傳空字串。"""
+        for index, char in enumerate(text):
+            if self._depth == 0:
+                # 尚未進入物件：略過前綴說明文字
+                if char == "{":
+                    self._object = [char]
+                    self._depth = 1
+                continue
+
+            self._object.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._complete():
+                        return ""
+                    # 不是合法 JSON（例如說明文字中的大括號），從候選起點之後的下一個「{」重新尋找
+                    return self._restart() + text[index + 1:]
+        return ""
+
+    def _complete(self):
+        try:
+            self.value = json.loads("".join(self._object), strict=False)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(self.value, dict):
+            self.value = None
+            return False
+        self.done = True
+        return True
+
+    @property
+    def text(self):
+        """完成時回傳頂層物件原文，否則回傳目前收到的全部輸出。"""
+        if self.done:
+            return "".join(self._object)
+        return "".join(self.raw)
+
+
+def parse_first_object(text):
+    """從完整文字中取出第一個可解析的頂層 JSON 物件，找不到時回傳 None。"""
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    parser.finish()
+    return parser.value
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import httpx
+from ollama import ResponseError
+
+from context_window import (
+    DEFAULT_BUCKETS, DEFAULT_OUTPUT_RESERVE, DEFAULT_SHRINK_AFTER, ContextWindowSizer, estimate_tokens, parse_buckets
+)
+from model_registry import STAGE_OPTIONS, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+# 所有模組共用的 LLM 閘道：單例的 ModelRegistry（各 OllamaLLM 的 httpx 連線池保持 keep-alive 連線）、
+# 預先建立的具名 chain、每次呼叫的總時限、斷路器與帶抖動的指數退避重試。
+# 環境變數在第一次呼叫 get_gateway() 時才讀取：
+#   LLM_CALL_TIMEOUT        單次呼叫總時限（秒），於串流的每個 chunk 之間檢查
+#   LLM_CONNECT_TIMEOUT     建立連線逾時（秒）
+#   LLM_READ_TIMEOUT        兩個 chunk 之間的讀取逾時（秒），避免 Ollama 卡住時無限等待
+#   LLM_MAX_CONNECTIONS     每個 Ollama 後端的 HTTP 連線上限
+#   LLM_KEEPALIVE_EXPIRY    閒置 keep-alive 連線保留時間（秒）
+#   LLM_MAX_RETRIES         連線錯誤或 5xx 時的重試次數（僅在尚未輸出任何 token 時重試）
+#   LLM_RETRY_BASE / LLM_RETRY_MAX  退避基準與上限（秒），實際等待為 [0, min(上限, 基準 * 2^n)] 的隨機值
+#   LLM_BREAKER_FAILURES    連續失敗幾次後斷路
+#   LLM_BREAKER_RESET       斷路後多久放行一次試探請求（秒）
+#   NUM_CTX_BUCKETS         以逗號分隔的 num_ctx 級距（空字串停用，沿用模型預設值），見 context_window
+#   NUM_CTX_OUTPUT_RESERVE  為生成內容預留的 token 數（模型設定 num_predict 時以其為準）
+#   NUM_CTX_SHRINK_AFTER    連續幾次請求可用更小級距才縮小
+
+
+class LLMTimeoutError(TimeoutError):
+    """LLM 呼叫超過總時限。"""
+
+
+class CircuitOpenError(RuntimeError):
+    """斷路器開啟中，LLM 呼叫直接失敗而不送出。"""
+
+
+class CircuitBreaker:
+    """連續失敗達 failure_threshold 次即斷路；經過 reset_timeout 秒後進入半開，只放行一個試探請求，
+    成功則恢復、失敗則重新斷路。"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("LLM 斷路器恢復")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning(f"LLM 連續失敗 {self.failures} 次，斷路 {self.reset_timeout:.0f} 秒")
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "opened": self.opened}
+
+
+def is_retryable(error):
+    """連線層錯誤、讀取逾時與 Ollama 5xx 可重試；4xx（如模型不存在）與呼叫時限用盡不重試。"""
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+# 已註冊 chain 的定義：依 num_ctx 級距建立的 chain 共用同一份提示、模型與 bind 參數
+ChainSpec = namedtuple("ChainSpec", ["prompt", "model", "options", "bind"])
+
+
+class LLMGateway:
+    """LLM 呼叫的唯一入口。chain 以名稱註冊一次（提示模板 | 模型.bind(...)），呼叫時只傳入變數。"""
+
+    def __init__(self, registry=None):
+        self.timeout = float(os.getenv("LLM_CALL_TIMEOUT", "120"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.retry_base = float(os.getenv("LLM_RETRY_BASE", "0.5"))
+        self.retry_max = float(os.getenv("LLM_RETRY_MAX", "5"))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30"))
+        )
+        client_kwargs = {
+            "timeout": httpx.Timeout(
+                float(os.getenv("LLM_READ_TIMEOUT", "60")), connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+            ),
+            "limits": httpx.Limits(
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "32")),
+                max_keepalive_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "32")),
+                keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "300"))
+            ),
+        }
+        self.models = registry or ModelRegistry(client_kwargs=client_kwargs)
+        self.context_sizer = ContextWindowSizer(
+            buckets=parse_buckets(os.getenv("NUM_CTX_BUCKETS", ",".join(map(str, DEFAULT_BUCKETS)))),
+            output_reserve=int(os.getenv("NUM_CTX_OUTPUT_RESERVE", str(DEFAULT_OUTPUT_RESERVE))),
+            shrink_after=int(os.getenv("NUM_CTX_SHRINK_AFTER", str(DEFAULT_SHRINK_AFTER)))
+        )
+        self._specs = {}
+        self._chains = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def llm(self, stage=None, model=None, **options):
+        """依階段（或指定模型）取得共用的 LLM 實例。"""
+        return self.models.create(model, **options) if model else self.models.get(stage)
+
+    def register(self, name, prompt, stage=None, model=None, **bind):
+        """註冊具名 chain；bind 參數（如 format=JSON Schema）綁定在模型上。重複註冊以最後一次為準。
+        各 num_ctx 級距的 chain 在第一次用到時建立並快取。"""
+        if model is None:
+            if stage not in self.models.models:
+                raise KeyError(f"未知的模型階段：{stage}")
+            model = self.models.models[stage]
+            options = {k: v for k, v in STAGE_OPTIONS.get(stage, {}).items() if v is not None}
+        else:
+            options = {}
+        with self._lock:
+            self._specs[name] = ChainSpec(prompt, model, options, bind)
+            self._chains = {key: chain for key, chain in self._chains.items() if key[0] != name}
+        self.chain(name)
+        return name
+
+    def chain(self, name, num_ctx=None):
+        """取得（或建立）指定 num_ctx 級距的 chain；num_ctx 為 None 時使用模型預設的上下文長度。"""
+        key = (name, num_ctx)
+        chain = self._chains.get(key)
+        if chain is not None:
+            return chain
+        try:
+            spec = self._specs[name]
+        except KeyError:
+            raise KeyError(f"未註冊的 LLM chain：{name}") from None
+        llm = self.models.create(spec.model, num_ctx=num_ctx, **spec.options)
+        if spec.bind:
+            llm = llm.bind(**spec.bind)
+        with self._lock:
+            return self._chains.setdefault(key, spec.prompt | llm)
+
+    def has_chain(self, name):
+        return name in self._specs
+
+    def sized_chain(self, name, variables):
+        """依提示的估計 token 數選擇 num_ctx 級距，回傳對應的 chain。"""
+        if not self.context_sizer.enabled:
+            return self.chain(name)
+        spec = self._specs.get(name)
+        if spec is None:
+            return self.chain(name)
+        prompt_tokens = estimate_tokens(spec.prompt.format(**variables))
+        num_ctx = self.context_sizer.select(spec.model, prompt_tokens, spec.options.get("num_predict"))
+        return self.chain(name, num_ctx)
+
+    def _deadline(self, timeout):
+        # 呼叫端提供的逾時（如 gRPC 剩餘時間，未設定 deadline 時接近無限）僅能縮短 LLM_CALL_TIMEOUT
+        return time.monotonic() + (min(timeout, self.timeout) if timeout is not None else self.timeout)
+
+    def _before_attempt(self, name):
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(f"LLM 斷路中，拒絕呼叫 {name}")
+
+    def _after_failure(self, name, error, attempt, yielded, deadline):
+        """記錄失敗並決定是否重試；回傳退避秒數，不重試時回傳 None。"""
+        retryable = is_retryable(error)
+        if retryable or isinstance(error, LLMTimeoutError):
+            self.breaker.record_failure()
+        else:
+            # 後端有回應（如 4xx），不計入斷路
+            self.breaker.record_success()
+        with self._lock:
+            self.failures += 1
+        if yielded or not retryable or attempt >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        with self._lock:
+            self.retries += 1
+        logger.warning(f"LLM 呼叫 {name} 失敗（{error}），{delay:.2f} 秒後第 {attempt + 1} 次重試")
+        return delay
+
+    def _check_deadline(self, name, deadline):
+        if time.monotonic() > deadline:
+            raise LLMTimeoutError(f"LLM 呼叫 {name} 超過時限")
+
+    def stream(self, name, variables, timeout=None):
+        """逐 token 產生 chain 的輸出。尚未輸出任何 token 前的可重試錯誤會退避重試；
+        呼叫端提前結束迭代時關閉底層串流，中止 Ollama 生成。"""
+        chain = self.sized_chain(name, variables)
+        deadline = self._deadline(timeout)
+        with self._lock:
+            self.calls += 1
+        attempt = 0
+        while True:
+            self._before_attempt(name)
+            yielded = False
+            stream = chain.stream(variables)
+            try:
+                for token in stream:
+                    self._check_deadline(name, deadline)
+                    yielded = True
+                    yield token
+                self.breaker.record_success()
+                return
+            except GeneratorExit:
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                delay = self._after_failure(name, e, attempt, yielded, deadline)
+                if delay is None:
+                    raise
+            finally:
+                stream.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def astream(self, name, variables, timeout=None):
+        chain = self.sized_chain(name, variables)
+        deadline = self._deadline(timeout)
+        with self._lock:
+            self.calls += 1
+        attempt = 0
+        while True:
+            self._before_attempt(name)
+            yielded = False
+            stream = chain.astream(variables)
+            try:
+                async for token in stream:
+                    self._check_deadline(name, deadline)
+                    yielded = True
+                    yield token
+                self.breaker.record_success()
+                return
+            except (GeneratorExit, asyncio.CancelledError):
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                delay = self._after_failure(name, e, attempt, yielded, deadline)
+                if delay is None:
+                    raise
+            finally:
+                await stream.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def invoke(self, name, variables, timeout=None):
+        return "".join(self.stream(name, variables, timeout))
+
+    async def ainvoke(self, name, variables, timeout=None):
+        return "".join([token async for token in self.astream(name, variables, timeout)])
+
+    def stats(self):
+        with self._lock:
+            stats = {"calls": self.calls, "retries": self.retries, "failures": self.failures, "rejected": self.rejected}
+        stats["breaker"] = self.breaker.stats()
+        stats["num_ctx"] = self.context_sizer.stats()
+        stats["backends"] = self.models.backends()
+        return stats
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """取得行程內共用的 LLMGateway（第一次呼叫時建立）。"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
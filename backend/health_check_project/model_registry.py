@@ -0,0 +1,102 @@
+import os
+import threading
+
+from langchain_ollama import OllamaLLM
+
+from ollama_pool import OllamaPool, PooledOllamaLLM
+
+# 各分析階段使用的 Ollama 模型。可用環境變數個別覆寫，例如：
+#   OLLAMA_MODEL_HYDE=llama3.2:1b           HyDE 假設性文件只用於檢索，可交給 1-3B 小模型
+#   OLLAMA_MODEL_USER_SUMMARY=llama3.2:3b   用戶健康摘要
+#   OLLAMA_MODEL_INSURER_ANALYSIS=llama3:8b 保險公司核保分析
+#   OLLAMA_MODEL_INTERACTIVE_QUERY=...      first/main.py 的互動問答與健康數據分析
+# OLLAMA_MODEL 設定所有階段的預設模型，OLLAMA_BASE_URL 設定 Ollama 服務位址。
+# OLLAMA_BASE_URLS 以逗號分隔多個 Ollama 執行個體（例如各 NUMA 節點一個），設定後改用後端池分派請求；
+# OLLAMA_PROBE_INTERVAL、OLLAMA_EJECT_AFTER、OLLAMA_EJECT_SECONDS 調整健康探測間隔與失敗剔除條件。
+HYDE = "hyde"
+USER_SUMMARY = "user_summary"
+INSURER_ANALYSIS = "insurer_analysis"
+INTERACTIVE_QUERY = "interactive_query"
+MODEL_STAGES = (HYDE, USER_SUMMARY, INSURER_ANALYSIS, INTERACTIVE_QUERY)
+
+# OLLAMA_KEEP_ALIVE 為模型常駐時間：請求之間模型與前綴 KV 快取保留在記憶體中，避免重新載入（"-1m" 表示永久常駐）。
+# 環境變數在建立 ModelRegistry 時才讀取，呼叫端可先載入 .env。
+DEFAULT_MODEL = "llama3:8b"
+DEFAULT_BASE_URL = "http://localhost:11434"
+DEFAULT_KEEP_ALIVE = "30m"
+
+# 各階段的生成參數（temperature 為 None 時使用模型預設值）
+STAGE_OPTIONS = {
+    HYDE: {"temperature": None},
+    USER_SUMMARY: {"temperature": None},
+    INSURER_ANALYSIS: {"temperature": None},
+    INTERACTIVE_QUERY: {"temperature": 0.3},
+}
+
+
+def base_urls(base_url=None):
+    """Ollama 後端位址清單：明確指定的 base_url 優先，其次 OLLAMA_BASE_URLS、OLLAMA_BASE_URL。"""
+    if base_url:
+        return [base_url]
+    urls = [url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "").split(",") if url.strip()]
+    return urls or [os.getenv("OLLAMA_BASE_URL", DEFAULT_BASE_URL)]
+
+
+def stage_model(stage):
+    return os.getenv(f"OLLAMA_MODEL_{stage.upper()}", os.getenv("OLLAMA_MODEL", DEFAULT_MODEL))
+
+
+class ModelRegistry:
+    """依階段回傳設定好的 OllamaLLM；模型與參數相同的階段共用同一個實例。
+    設定多個後端時回傳 PooledOllamaLLM，所有階段共用同一個後端池，進行中請求數跨階段計算。"""
+
+    def __init__(self, models=None, base_url=None, keep_alive=None, client_kwargs=None):
+        self.models = {stage: stage_model(stage) for stage in MODEL_STAGES}
+        self.models.update(models or {})
+        urls = base_urls(base_url)
+        self.base_url = urls[0]
+        self.pool = None
+        if len(urls) > 1:
+            self.pool = OllamaPool(
+                urls,
+                probe_interval=float(os.getenv("OLLAMA_PROBE_INTERVAL", "10")),
+                eject_after=int(os.getenv("OLLAMA_EJECT_AFTER", "3")),
+                eject_seconds=float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+            )
+            self.pool.start()
+        self.keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", DEFAULT_KEEP_ALIVE)
+        # 傳給 Ollama 的 httpx 用戶端（逾時、連線池上限等），每個實例各自保有一組 keep-alive 連線
+        self.client_kwargs = client_kwargs
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def create(self, model, **options):
+        """依模型名稱與生成參數取得（或建立）OllamaLLM 實例。"""
+        options = {key: value for key, value in options.items() if value is not None}
+        key = (model, tuple(sorted(options.items())))
+        with self._lock:
+            llm = self._instances.get(key)
+            if llm is None:
+                if self.pool is not None:
+                    llm = PooledOllamaLLM.create(
+                        self.pool, model, keep_alive=self.keep_alive, client_kwargs=self.client_kwargs, **options
+                    )
+                else:
+                    llm = OllamaLLM(
+                        model=model, base_url=self.base_url, keep_alive=self.keep_alive,
+                        client_kwargs=self.client_kwargs, **options
+                    )
+                self._instances[key] = llm
+            return llm
+
+    def get(self, stage):
+        if stage not in self.models:
+            raise KeyError(f"未知的模型階段：{stage}")
+        return self.create(self.models[stage], **STAGE_OPTIONS.get(stage, {}))
+
+    def describe(self):
+        return dict(self.models)
+
+    def backends(self):
+        """各後端的健康狀態與負載；單一後端時回傳空列表。"""
+        return self.pool.stats() if self.pool is not None else []
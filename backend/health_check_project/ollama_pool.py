@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import threading
+import time
+import urllib.request
+from typing import Any, Optional
+
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.outputs import LLMResult
+from langchain_ollama import OllamaLLM
+from pydantic import ConfigDict
+
+logger = logging.getLogger(__name__)
+
+# 多個 Ollama 執行個體（例如各自綁定不同 NUMA 節點）組成後端池：
+# 每次請求挑選「進行中請求數最少」的健康後端；連續失敗達 eject_after 次即剔除 eject_seconds 秒，
+# 背景探測（GET /api/version）成功後恢復。全部後端都被剔除時仍選最早可恢復者，不直接拒絕請求。
+DEFAULT_PROBE_INTERVAL = 10.0
+DEFAULT_PROBE_TIMEOUT = 2.0
+DEFAULT_EJECT_AFTER = 3
+DEFAULT_EJECT_SECONDS = 30.0
+
+
+class OllamaBackend:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def available(self, now):
+        return self.ejected_until <= now
+
+
+class OllamaPool:
+    """Ollama 後端池：最少進行中請求負載平衡、健康探測與失敗剔除。"""
+
+    def __init__(self, urls, probe_interval=DEFAULT_PROBE_INTERVAL, probe_timeout=DEFAULT_PROBE_TIMEOUT,
+                 eject_after=DEFAULT_EJECT_AFTER, eject_seconds=DEFAULT_EJECT_SECONDS):
+        if not urls:
+            raise ValueError("Ollama 後端池至少需要一個後端位址")
+        self.backends = [OllamaBackend(url) for url in urls]
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stop = threading.Event()
+        self._prober = None
+
+    @property
+    def urls(self):
+        return [backend.url for backend in self.backends]
+
+    def acquire(self):
+        """挑選後端並將其進行中請求數加一；同分時輪替，避免總是落在第一個後端。"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [backend for backend in self.backends if backend.available(now)]
+            if not candidates:
+                # 全部被剔除：選最早可恢復的後端，讓請求仍有機會成功
+                candidates = [min(self.backends, key=lambda backend: backend.ejected_until)]
+            start = self._next
+            self._next = (self._next + 1) % len(self.backends)
+            ordered = candidates[start % len(candidates):] + candidates[:start % len(candidates)]
+            backend = min(ordered, key=lambda backend: backend.outstanding)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, ok=True):
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.failures = 0
+                return
+            backend.errors += 1
+            self._record_failure(backend)
+
+    def _record_failure(self, backend):
+        backend.failures += 1
+        if backend.failures >= self.eject_after and backend.available(time.monotonic()):
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+            backend.ejections += 1
+            logger.warning(f"Ollama 後端 {backend.url} 連續失敗 {backend.failures} 次，暫時剔除 {self.eject_seconds:.0f} 秒")
+
+    def probe(self, backend):
+        """探測單一後端；成功時清除失敗計數並提前恢復被剔除的後端。"""
+        try:
+            with urllib.request.urlopen(f"{backend.url}/api/version", timeout=self.probe_timeout) as response:
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        with self._lock:
+            if ok:
+                if not backend.available(time.monotonic()):
+                    logger.info(f"Ollama 後端 {backend.url} 探測成功，恢復服務")
+                backend.failures = 0
+                backend.ejected_until = 0.0
+            else:
+                self._record_failure(backend)
+        return ok
+
+    def probe_all(self):
+        return {backend.url: self.probe(backend) for backend in self.backends}
+
+    def start(self):
+        """啟動背景健康探測執行緒（重複呼叫無作用）。"""
+        with self._lock:
+            if self._prober is not None or self.probe_interval <= 0:
+                return
+            self._prober = threading.Thread(target=self._probe_loop, name="ollama-pool-probe", daemon=True)
+            self._prober.start()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            self.probe_all()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "url": backend.url,
+                    "healthy": backend.available(now),
+                    "outstanding": backend.outstanding,
+                    "requests": backend.requests,
+                    "errors": backend.errors,
+                    "ejections": backend.ejections,
+                }
+                for backend in self.backends
+            ]
+
+
+class PooledOllamaLLM(BaseLLM):
+    """透過 OllamaPool 分派請求的 LLM：每個後端各有一個參數相同的 OllamaLLM，
+    每次呼叫（含串流）期間計入該後端的進行中請求數，失敗時回報給後端池。
+    bind(format=...) 等呼叫參數會原樣傳給選中的後端。"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    pool: Any
+    clients: dict
+    model: str
+    temperature: Optional[float] = None
+
+    @classmethod
+    def create(cls, pool, model, **options):
+        clients = {url: OllamaLLM(model=model, base_url=url, **options) for url in pool.urls}
+        return cls(pool=pool, clients=clients, model=model, temperature=options.get("temperature"))
+
+    @property
+    def _llm_type(self):
+        return "pooled-ollama"
+
+    @property
+    def _identifying_params(self):
+        return {"model": self.model, "temperature": self.temperature, "backends": self.pool.urls}
+
+    def _generate(self, prompts, stop=None, run_manager=None, **kwargs) -> LLMResult:
+        backend = self.pool.acquire()
+        ok = False
+        try:
+            result = self.clients[backend.url]._generate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+            ok = True
+            return result
+        finally:
+            self.pool.release(backend, ok)
+
+    async def _agenerate(self, prompts, stop=None, run_manager=None, **kwargs) -> LLMResult:
+        backend = self.pool.acquire()
+        ok = False
+        try:
+            result = await self.clients[backend.url]._agenerate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+            ok = True
+            return result
+        except asyncio.CancelledError:
+            ok = True
+            raise
+        finally:
+            self.pool.release(backend, ok)
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        backend = self.pool.acquire()
+        ok = False
+        try:
+            yield from self.clients[backend.url]._stream(prompt, stop=stop, run_manager=run_manager, **kwargs)
+            ok = True
+        except GeneratorExit:
+            # 呼叫端提前結束串流（例如客戶端取消），不算後端失敗
+            ok = True
+            raise
+        finally:
+            self.pool.release(backend, ok)
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        backend = self.pool.acquire()
+        ok = False
+        try:
+            async for chunk in self.clients[backend.url]._astream(prompt, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            ok = True
+        except (GeneratorExit, asyncio.CancelledError):
+            ok = True
+            raise
+        finally:
+            self.pool.release(backend, ok)
@@ -0,0 +1,193 @@
+import re
+from collections import namedtuple
+
+# 檢驗指標參考範圍：(下限, 上限, 單位)，None 表示該側不設限。
+# 血糖、血脂、肝腎功能、血液常規與 hsCRP 沿用 DEFAULT_DOCS 與提示醫療背景中的數值，其餘採常用成人參考值。
+REFERENCE_RANGES = {
+    "Glu-AC": (70, 100, "mg/dL"),
+    "HbA1c": (4, 6, "%"),
+    "Glu-PC": (None, 140, "mg/dL"),
+    "Alb": (3.5, 5.0, "g/dL"),
+    "TP": (6.0, 8.3, "g/dL"),
+    "AST(GOT)": (None, 50, "U/L"),
+    "ALT(GPT)": (None, 50, "U/L"),
+    "D-Bil": (None, 0.3, "mg/dL"),
+    "ALP": (40, 130, "U/L"),
+    "T-Bil": (0.3, 1.2, "mg/dL"),
+    "UN": (7, 20, "mg/dL"),
+    "CRE": (0.6, 1.2, "mg/dL"),
+    "U.A": (3.0, 7.0, "mg/dL"),
+    "T-CHO": (None, 200, "mg/dL"),
+    "LDL-C": (None, 120, "mg/dL"),
+    "HDL-C": (40, None, "mg/dL"),
+    "TG": (None, 150, "mg/dL"),
+    "Hb": (12, 16, "g/dL"),
+    "Hct": (36, 50, "%"),
+    "PLT": (150, 450, "x10^3/uL"),
+    "WBC": (4, 10, "x10^3/uL"),
+    "RBC": (4.0, 5.9, "x10^6/uL"),
+    "hsCRP": (None, 1, "mg/dL"),
+    "AFP": (None, 20, "ng/mL"),
+    "CEA": (None, 5, "ng/mL"),
+    "CA-125": (None, 35, "U/mL"),
+    "CA19-9": (None, 37, "U/mL"),
+    "MCV": (80, 100, "fL"),
+    "MCH": (27, 34, "pg"),
+    "MCHC": (32, 36, "g/dL"),
+    "PT": (9.5, 13.5, "sec"),
+    "aPTT": (25, 40, "sec"),
+    "ESR": (None, 20, "mm/hr"),
+    "RDW-CV": (11.5, 14.5, "%"),
+    "Specific Gravity": (1.005, 1.030, ""),
+    "PH": (4.5, 8.0, ""),
+    "Urobilinogen (Dipstick)": (0.1, 1.0, "mg/dL"),
+    "RBC (Urine)": (None, 2, "/HPF"),
+    "WBC (Urine)": (None, 5, "/HPF"),
+    "Epithelial Cells": (None, 5, "/HPF"),
+    "Casts": (None, 2, "/LPF"),
+    "Albumin (Dipstick)": (None, 30, "mg/L"),
+    "Alb/CRE Ratio": (None, 30, "mg/g"),
+}
+
+# 血壓：收縮壓 < 120 mmHg 且舒張壓 < 80 mmHg 為正常
+BLOOD_PRESSURE_LIMITS = (120, 80)
+
+# 試紙等定性項目：陰性或未檢出為正常
+QUALITATIVE_METRICS = {
+    "Protein (Dipstick)", "Glucose (Dipstick)", "Bilirubin (Dipstick)", "Ketone", "Crystal", "Bacteria",
+    "Nitrite", "Occult Blood", "WBC Esterase", "Creatinine (Dipstick)"
+}
+NEGATIVE_VALUES = {"-", "negative", "neg", "none", "nil", "陰性", "無"}
+TRACE_VALUES = {"±", "+-", "trace", "微量"}
+MISSING_VALUES = {"", "n/a", "na", "null", "未檢測"}
+
+# 在正常範圍內但距離上下限不到 5% 的數值視為臨界：
+# 雙側範圍以範圍寬度的 5% 計算，單側範圍（只有上限或下限）以該限值的 5% 計算
+BORDERLINE_MARGIN = 0.05
+
+NORMAL = "正常"
+HIGH = "偏高"
+LOW = "偏低"
+BORDERLINE_HIGH = "臨界偏高"
+BORDERLINE_LOW = "臨界偏低"
+POSITIVE = "陽性"
+TRACE = "微量"
+MISSING = "未檢測"
+UNKNOWN = "無參考範圍"
+
+# 需要交由 LLM 分析的狀態
+NOTABLE_STATUSES = {HIGH, LOW, BORDERLINE_HIGH, BORDERLINE_LOW, POSITIVE, TRACE, UNKNOWN}
+
+MetricFinding = namedtuple("MetricFinding", ["name", "value", "number", "status", "reference"])
+
+_NUMBER = re.compile(r"^-?\d+(\.\d+)?")
+_BLOOD_PRESSURE = re.compile(r"^(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)")
+
+
+def normalize_name(name):
+    """統一指標名稱寫法（例如全形括號「AST（GOT）」），對應參考範圍表的鍵。"""
+    return str(name).strip().replace("（", "(").replace("）", ")")
+
+
+def parse_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.match(str(value).strip())
+    return float(match.group(0)) if match else None
+
+
+def format_reference(low, high, unit):
+    unit = f" {unit}" if unit else ""
+    if low is None:
+        return f"< {high:g}{unit}"
+    if high is None:
+        return f"> {low:g}{unit}"
+    return f"{low:g}-{high:g}{unit}"
+
+
+def _range_status(number, low, high):
+    if low is not None and number < low:
+        return LOW
+    if high is not None and number > high:
+        return HIGH
+    if low is not None and high is not None:
+        margin = BORDERLINE_MARGIN * (high - low)
+        high_margin, low_margin = margin, margin
+    else:
+        high_margin = BORDERLINE_MARGIN * abs(high) if high is not None else 0
+        low_margin = BORDERLINE_MARGIN * abs(low) if low is not None else 0
+    if high is not None and number >= high - high_margin:
+        return BORDERLINE_HIGH
+    if low is not None and number <= low + low_margin:
+        return BORDERLINE_LOW
+    return NORMAL
+
+
+def evaluate_blood_pressure(value):
+    match = _BLOOD_PRESSURE.match(str(value).strip())
+    reference = f"< {BLOOD_PRESSURE_LIMITS[0]}/{BLOOD_PRESSURE_LIMITS[1]} mmHg"
+    if not match:
+        return None, UNKNOWN, reference
+    systolic, diastolic = float(match.group(1)), float(match.group(2))
+    if systolic >= BLOOD_PRESSURE_LIMITS[0] + 10 or diastolic >= BLOOD_PRESSURE_LIMITS[1] + 10:
+        status = HIGH
+    elif systolic >= BLOOD_PRESSURE_LIMITS[0] or diastolic >= BLOOD_PRESSURE_LIMITS[1]:
+        status = BORDERLINE_HIGH
+    else:
+        status = NORMAL
+    return (systolic, diastolic), status, reference
+
+
+def evaluate_metric(name, value):
+    """依參考範圍判定單一指標，回傳 MetricFinding；number 為解析出的數值（血壓為 (收縮壓, 舒張壓)）。"""
+    key = normalize_name(name)
+    text = str(value).strip()
+    lowered = text.lower()
+    if lowered in MISSING_VALUES:
+        return MetricFinding(key, value, None, MISSING, "")
+    if key == "BP":
+        number, status, reference = evaluate_blood_pressure(text)
+        return MetricFinding(key, value, number, status, reference)
+    if key in QUALITATIVE_METRICS or lowered in NEGATIVE_VALUES or lowered in TRACE_VALUES:
+        if lowered in NEGATIVE_VALUES:
+            status = NORMAL
+        elif lowered in TRACE_VALUES:
+            status = TRACE
+        else:
+            status = POSITIVE
+        return MetricFinding(key, value, None, status, "陰性")
+    number = parse_number(value)
+    if key not in REFERENCE_RANGES or number is None:
+        return MetricFinding(key, value, number, UNKNOWN, "")
+    low, high, unit = REFERENCE_RANGES[key]
+    return MetricFinding(key, value, number, _range_status(number, low, high), format_reference(low, high, unit))
+
+
+def evaluate_results(test_results):
+    return [evaluate_metric(name, value) for name, value in test_results.items()]
+
+
+def summarize_findings(findings):
+    """僅列出異常、臨界或無參考範圍的指標，其餘以一行「皆正常」帶過，縮短送入 LLM 的提示。
+    未檢測的指標另列一行，避免被當成已確認正常。"""
+    lines = []
+    missing = []
+    normal_count = 0
+    for finding in findings:
+        if finding.status == MISSING:
+            missing.append(finding.name)
+            continue
+        if finding.status not in NOTABLE_STATUSES:
+            normal_count += int(finding.status == NORMAL)
+            continue
+        detail = finding.status if not finding.reference else f"{finding.status}，參考範圍 {finding.reference}"
+        lines.append(f"{finding.name}: {finding.value}（{detail}）")
+    if missing:
+        lines.append(f"未檢測（無檢驗結果，不可視為正常）：{'、'.join(missing)}")
+    if not lines:
+        return f"全部 {normal_count} 項指標均在正常範圍內。"
+    if normal_count:
+        lines.append(f"其餘 {normal_count} 項已檢測指標均在正常範圍內。")
+    return "\n".join(lines)
@@ -0,0 +1,126 @@
+import os
+import threading
+
+from langchain.docstore.document import Document
+
+from analysis_cache import LRUTTLCache, canonical_hash
+from embedding_cache import text_hash
+
+# 檢索結果快取：以 (集合, 查詢雜湊, k, 過濾條件, 知識庫版本) 為鍵，只保存文件 ID 與分數，
+# 命中時以 ID 取回文件內容，略過查詢嵌入與 HNSW 搜尋
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048"))
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", "86400"))  # 秒
+KB_VERSION_FILE = "kb_version"
+
+
+class KnowledgeBaseVersion:
+    """存放在 Chroma 資料夾中的知識庫版本計數器；寫入知識庫後呼叫 bump，其他行程讀到新版本後舊的檢索結果即失效。"""
+
+    def __init__(self, persist_directory):
+        self.path = os.path.join(persist_directory, KB_VERSION_FILE)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._version = 0
+
+    def current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        with self._lock:
+            if mtime != self._mtime:
+                self._version = self._read()
+                self._mtime = mtime
+            return self._version
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump(self):
+        with self._lock:
+            version = self._read() + 1
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(version))
+            os.replace(tmp_path, self.path)
+            self._mtime = None
+            return version
+
+
+class RetrievalCache:
+    """Chroma 相似度搜尋的結果快取；介面與 vectorstore.similarity_search / similarity_search_with_score 相同。"""
+
+    def __init__(self, vectorstore, version, max_size=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL):
+        self.vectorstore = vectorstore
+        self.version = version
+        self.cache = LRUTTLCache(max_size=max_size, ttl=ttl)
+
+    def key(self, query, k, filter=None):
+        collection = self.vectorstore._collection.name
+        return canonical_hash(collection, text_hash(query), k, filter, self.version.current())
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return self.batch_similarity_search([query], k, filter)[0]
+
+    def batch_similarity_search(self, queries, k=4, filter=None):
+        """依輸入順序回傳各查詢的 (Document, score) 列表；未命中的查詢以單次嵌入計算與單次 Chroma 查詢處理。"""
+        keys = [self.key(query, k, filter) for query in queries]
+        results = {}
+        for key in set(keys):
+            hits = self.cache.get(key)
+            if hits is not None:
+                docs = self.fetch(hits)
+                if docs is not None:
+                    results[key] = docs
+        missing = {key: query for key, query in zip(keys, queries) if key not in results}
+        if missing:
+            for key, docs_with_scores in zip(missing, self.search(list(missing.values()), k, filter)):
+                self.cache.set(key, [(doc.id, score) for doc, score in docs_with_scores])
+                results[key] = docs_with_scores
+        return [results[key] for key in keys]
+
+    def search(self, queries, k, filter=None):
+        embedding = self.vectorstore.embeddings
+        if hasattr(embedding, "embed_queries"):
+            query_embeddings = embedding.embed_queries(queries)
+        else:
+            query_embeddings = embedding.embed_documents(queries)
+        results = self.vectorstore._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=filter,
+            include=["documents", "metadatas", "distances"]
+        )
+        batched = []
+        for i in range(len(queries)):
+            batched.append([
+                (Document(page_content=content or "", metadata=metadata or {}, id=doc_id), distance)
+                for doc_id, content, metadata, distance in zip(
+                    results["ids"][i], results["documents"][i], results["metadatas"][i], results["distances"][i]
+                )
+            ])
+        return batched
+
+    def fetch(self, hits):
+        """以文件 ID 取回內容；任一文件已不存在時回傳 None，改為重新搜尋。"""
+        if not hits:
+            return []
+        found = self.vectorstore._collection.get(ids=[doc_id for doc_id, _ in hits], include=["documents", "metadatas"])
+        docs = {
+            doc_id: Document(page_content=content or "", metadata=metadata or {}, id=doc_id)
+            for doc_id, content, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        if len(docs) < len(hits):
+            return None
+        return [(docs[doc_id], score) for doc_id, score in hits]
+
+    def stats(self):
+        return {"hits": self.cache.hits, "misses": self.cache.misses, "entries": len(self.cache), "version": self.version.current()}
@@ -0,0 +1,190 @@
+from collections import namedtuple
+
+from reference_ranges import (
+    BORDERLINE_HIGH, BORDERLINE_LOW, HIGH, LOW, POSITIVE, REFERENCE_RANGES, TRACE, BLOOD_PRESSURE_LIMITS,
+    evaluate_results
+)
+
+# 規則式風險評估：依指標異常方向與偏離程度計分，取代由 LLM 生成 risks。
+# metrics 中的方向：high 僅偏高計分、low 僅偏低計分、positive 為定性陽性計分。
+RiskRule = namedtuple("RiskRule", ["disease", "metrics", "consequence", "policies"])
+
+RISK_RULES = [
+    RiskRule(
+        "心血管疾病",
+        {"LDL-C": "high", "T-CHO": "high", "TG": "high", "HDL-C": "low", "hsCRP": "high"},
+        "長期可能增加動脈粥樣硬化、冠心病與中風風險。",
+        ["重大疾病險", "醫療險"]
+    ),
+    RiskRule(
+        "高血壓",
+        {"BP": "high"},
+        "長期血壓偏高可能造成心臟、腎臟與腦血管損傷。",
+        ["重大疾病險", "醫療險"]
+    ),
+    RiskRule(
+        "糖尿病",
+        {"Glu-AC": "high", "HbA1c": "high", "Glu-PC": "high", "Glucose (Dipstick)": "positive"},
+        "血糖控制不佳可能導致視網膜、腎臟與神經等慢性併發症。",
+        ["健康險", "重大疾病險"]
+    ),
+    RiskRule(
+        "腎功能異常",
+        {"CRE": "high", "UN": "high", "Alb/CRE Ratio": "high", "Protein (Dipstick)": "positive",
+         "Albumin (Dipstick)": "high"},
+        "腎功能持續下降可能進展為慢性腎臟病。",
+        ["健康險", "醫療險"]
+    ),
+    RiskRule(
+        "肝功能異常",
+        {"ALT(GPT)": "high", "AST(GOT)": "high", "ALP": "high", "T-Bil": "high", "D-Bil": "high",
+         "Bilirubin (Dipstick)": "positive"},
+        "肝臟發炎或膽道問題若未追蹤，可能發展為慢性肝病。",
+        ["健康險", "醫療險"]
+    ),
+    RiskRule(
+        "貧血",
+        {"Hb": "low", "RBC": "low", "Hct": "low", "MCV": "low", "MCH": "low"},
+        "可能造成疲倦與活動耐受度下降，需確認是否有缺鐵或慢性失血。",
+        ["醫療險"]
+    ),
+    RiskRule(
+        "發炎或感染",
+        {"hsCRP": "high", "WBC": "high", "ESR": "high"},
+        "體內可能存在發炎或感染，需追蹤確認原因。",
+        ["醫療險"]
+    ),
+    RiskRule(
+        "痛風",
+        {"U.A": "high"},
+        "尿酸偏高可能引發痛風性關節炎與腎結石。",
+        ["醫療險"]
+    ),
+    RiskRule(
+        "泌尿道感染",
+        {"Nitrite": "positive", "WBC Esterase": "positive", "WBC (Urine)": "high", "Bacteria": "positive"},
+        "可能存在泌尿道感染，未治療可能上行影響腎臟。",
+        ["醫療險"]
+    ),
+    RiskRule(
+        "腫瘤標記異常",
+        {"AFP": "high", "CEA": "high", "CA-125": "high", "CA19-9": "high"},
+        "腫瘤標記偏高不代表確診，但需進一步影像或專科檢查排除惡性腫瘤。",
+        ["防癌險", "重大疾病險"]
+    ),
+]
+
+DEFAULT_POLICIES = ["健康險", "壽險"]
+
+# 風險分數門檻：總分達 SEVERE_SCORE 為重度、達 MODERATE_SCORE 為中度、達 MIN_SCORE 才列為風險
+MIN_SCORE = 1.0
+MODERATE_SCORE = 2.0
+SEVERE_SCORE = 4.0
+
+IMPACT_LEVELS = ["輕度", "中度", "重度"]
+UNDERWRITING = {
+    "重度": "高風險，建議加費承保或延期承保，並安排人工核保。",
+    "中度": "中度風險，建議附加條件或加費承保，並要求定期追蹤相關指標。",
+    "輕度": "低度風險，可標準體承保，建議定期追蹤相關指標。",
+    None: "各項指標未見明顯風險，可標準體承保。"
+}
+
+
+def _deviation_score(number, key):
+    """依偏離參考範圍的比例計分：< 20% 為 1 分、< 50% 為 2 分、其餘 3 分。"""
+    low, high, _ = REFERENCE_RANGES[key]
+    bound = high if high is not None and number > high else low
+    if not bound:
+        return 1.0
+    ratio = abs(number - bound) / bound
+    return 1.0 if ratio < 0.2 else 2.0 if ratio < 0.5 else 3.0
+
+
+def _blood_pressure_score(number):
+    systolic, diastolic = number
+    if systolic >= 160 or diastolic >= 100:
+        return 3.0
+    if systolic >= 140 or diastolic >= 90:
+        return 2.0
+    if systolic >= BLOOD_PRESSURE_LIMITS[0] + 10 or diastolic >= BLOOD_PRESSURE_LIMITS[1] + 10:
+        return 1.0
+    return 0.5
+
+
+def score_finding(finding, direction):
+    """單一指標對規則的貢獻分數，方向不符或正常時為 0。"""
+    status = finding.status
+    if direction == "positive":
+        return {POSITIVE: 2.0, TRACE: 1.0}.get(status, 0.0)
+    if finding.name == "BP":
+        return _blood_pressure_score(finding.number) if status in (HIGH, BORDERLINE_HIGH) else 0.0
+    if (direction == "high" and status == BORDERLINE_HIGH) or (direction == "low" and status == BORDERLINE_LOW):
+        return 0.5
+    if (direction == "high" and status == HIGH) or (direction == "low" and status == LOW):
+        return _deviation_score(finding.number, finding.name)
+    return 0.0
+
+
+def impact_level(score):
+    if score >= SEVERE_SCORE:
+        return IMPACT_LEVELS[2]
+    if score >= MODERATE_SCORE:
+        return IMPACT_LEVELS[1]
+    return IMPACT_LEVELS[0]
+
+
+def assess_risks(test_results, names=None):
+    """依規則計算風險列表（dict：disease、impact、description、score、policies），依分數由高到低排序。"""
+    names = names or {}
+    findings = {finding.name: finding for finding in evaluate_results(test_results)}
+    risks = []
+    for rule in RISK_RULES:
+        score = 0.0
+        evidence = []
+        for key, direction in rule.metrics.items():
+            finding = findings.get(key)
+            if finding is None:
+                continue
+            points = score_finding(finding, direction)
+            if points:
+                score += points
+                reference = f"，參考範圍 {finding.reference}" if finding.reference else ""
+                evidence.append(f"{names.get(key, key)} {str(finding.value).strip()}（{finding.status}{reference}）")
+        if score < MIN_SCORE:
+            continue
+        risks.append({
+            "disease": rule.disease,
+            "impact": impact_level(score),
+            "description": f"{'、'.join(evidence)}。{rule.consequence}",
+            "score": score,
+            "policies": rule.policies
+        })
+    risks.sort(key=lambda risk: risk["score"], reverse=True)
+    return risks
+
+
+def recommend_policies(risks):
+    """依風險對應的保單種類推薦，至少兩種，不足時以預設保單補齊。"""
+    policies = []
+    for risk in risks:
+        for policy in risk["policies"]:
+            if policy not in policies:
+                policies.append(policy)
+    for policy in DEFAULT_POLICIES:
+        if len(policies) >= 2:
+            break
+        if policy not in policies:
+            policies.append(policy)
+    return policies
+
+
+def underwriting_suggestion(risks):
+    level = max((IMPACT_LEVELS.index(risk["impact"]) for risk in risks), default=None)
+    return UNDERWRITING[IMPACT_LEVELS[level] if level is not None else None]
+
+
+def format_risks(risks):
+    """風險列表的文字版，供保險公司分析提示與僅風險模式的摘要使用。"""
+    if not risks:
+        return "未發現明顯疾病風險。"
+    return "\n".join(f"- {risk['disease']}（{risk['impact']}）：{risk['description']}" for risk in risks)
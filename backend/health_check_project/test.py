@@ -1,30 +1,235 @@
+import asyncio
 import grpc
+import threading
 from concurrent import futures
 import logging
 import json
+import os
 import re
 from langchain.prompts import PromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_ollama import OllamaLLM
 import data_pb2
 import data_pb2_grpc
+from analysis_cache import (
+    AsyncSingleFlight, LRUTTLCache, ResponseCache, SingleFlight, canonical_hash, canonical_results
+)
+from json_stream import StreamingJSONParser, parse_first_object
+from analysis_schema import ANALYSIS_SCHEMAS, validate
+from reference_ranges import (
+    NOTABLE_STATUSES, REFERENCE_RANGES, evaluate_metric, evaluate_results, format_reference, summarize_findings
+)
+from risk_engine import assess_risks, format_risks, recommend_policies, underwriting_suggestion
+from brownout import BrownoutController
+from context_assembler import ContextAssembler, Passage
+from embedding_cache import CachedEmbeddings
+from retrieval_cache import KnowledgeBaseVersion, RetrievalCache
+from model_registry import HYDE, INSURER_ANALYSIS, USER_SUMMARY
+from llm_gateway import get_gateway
+from admission import (
+    AdmissionController, AdmissionDeadlineExceeded, AdmissionRejected, AsyncAdmissionController, PRIORITY_INSURER,
+    PRIORITY_USER
+)
 
 # 設置日誌
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
 logger = logging.getLogger(__name__)
 
+# 檢索設定
+RETRIEVAL_K = 3
+SCORE_THRESHOLD = 0.7
+# 自適應 HyDE：類別子查詢中分數低於門檻的文件少於 HYDE_MIN_DOCS 篇（或請求指定 use_hyde）才生成假設性文件，
+# 否則以檢驗結果的模板摘要直接嵌入檢索，省下一次完整的 LLM 生成
+HYDE_MIN_DOCS = int(os.getenv("HYDE_MIN_DOCS", "2"))
+# 送入分析提示的參考資料上限（估計 token 數）與單一段落上限，超過時在句子邊界截斷
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_PASSAGE_TOKENS = int(os.getenv("CONTEXT_PASSAGE_TOKENS", "300"))
+# 依異常與否決定是否檢索：指標全部正常的類別直接使用預先產生的參考範圍文字，只有含異常指標的類別才查詢 Chroma
+RETRIEVAL_ABNORMAL_ONLY = os.getenv("RETRIEVAL_ABNORMAL_ONLY", "1") == "1"
+RETRIEVAL_WORKERS = 8
+# grpc.aio 模式下嵌入與向量檢索（CPU 密集）使用的執行緒數上限
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+
+# 伺服器模式："thread"（ThreadPoolExecutor）或 "aio"（grpc.aio 協程）
+GRPC_SERVER_MODE = os.getenv("GRPC_SERVER_MODE", "thread")
+
+# LLM 准入控制：同時送往 Ollama 的請求上限與排隊上限，用戶分析優先於保險公司分析
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+# thread 模式的工作執行緒須容納准入控制中所有執行與排隊的請求，佇列滿時才會由准入控制回傳 RESOURCE_EXHAUSTED；
+# 另保留 GRPC_SPARE_WORKERS 給不需 LLM 的請求（快取命中、僅風險、佇列狀態）。
+# 超過執行緒數的 RPC 由 gRPC 直接以 RESOURCE_EXHAUSTED 拒絕（maximum_concurrent_rpcs），不在執行緒池中無限排隊
+GRPC_SPARE_WORKERS = int(os.getenv("GRPC_SPARE_WORKERS", "8"))
+GRPC_MAX_WORKERS = LLM_MAX_CONCURRENT + LLM_MAX_QUEUE + GRPC_SPARE_WORKERS
+PRIORITIES = {"user": PRIORITY_USER, "insurer": PRIORITY_INSURER}
+
+# 批次分析：單次請求的報告數上限，以及同時進行的生成數（與 LLM 並行上限一致以保持 Ollama 滿載）
+BATCH_MAX_REPORTS = int(os.getenv("BATCH_MAX_REPORTS", "100"))
+BATCH_PIPELINE_DEPTH = LLM_MAX_CONCURRENT
+
+# 檢索上下文快取（同一份報告的用戶與保險公司分析共用）
+CONTEXT_CACHE_SIZE = 256
+CONTEXT_CACHE_TTL = 3600  # 秒
+
+# LLM 回應持久化快取（報告內容不可變，重複檢視直接回傳先前的生成結果）
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "./response_cache.sqlite3")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+# 修改提示模板時需同步更新版本，避免沿用舊模板的快取結果
+PROMPT_VERSIONS = {"user": "user-v6", "insurer": "insurer-v6"}
+
+# 降級模式：LLM 准入佇列的排隊數達到 LLM_MAX_QUEUE 的 BROWNOUT_ENTER_FRACTION 時略過 HyDE、縮小檢索 k，
+# 並可改用較小的模型（BROWNOUT_MODEL）；排隊數降到 BROWNOUT_EXIT_FRACTION 以下且已維持 BROWNOUT_MIN_HOLD 秒後自動恢復。
+# 一般的並行請求只會短暫排隊，不應觸發降級
+BROWNOUT_ENTER_FRACTION = float(os.getenv("BROWNOUT_ENTER_FRACTION", "0.5"))
+BROWNOUT_EXIT_FRACTION = float(os.getenv("BROWNOUT_EXIT_FRACTION", "0.25"))
+BROWNOUT_ENTER_DEPTH = max(1, int(LLM_MAX_QUEUE * BROWNOUT_ENTER_FRACTION))
+BROWNOUT_EXIT_DEPTH = max(1, min(int(LLM_MAX_QUEUE * BROWNOUT_EXIT_FRACTION), BROWNOUT_ENTER_DEPTH))
+BROWNOUT_MIN_HOLD = float(os.getenv("BROWNOUT_MIN_HOLD", "30"))  # 秒
+BROWNOUT_RETRIEVAL_K = 1
+BROWNOUT_MODEL = os.getenv("BROWNOUT_MODEL", "")
+
+# 提示精簡：依參考範圍預先判定指標，只將異常或臨界的指標送入 LLM，其餘以一行「皆正常」帶過
+PROMPT_ABNORMAL_ONLY = os.getenv("PROMPT_ABNORMAL_ONLY", "1") == "1"
+
+# 各受眾的最終分析對應的模型階段（模型設定見 model_registry）
+AUDIENCE_STAGES = {"user": USER_SUMMARY, "insurer": INSURER_ANALYSIS}
+
+QUERY_CATEGORIES = {
+    "blood_sugar": ["Glu-AC", "HbA1c", "Glu-PC"],
+    "lipid": ["LDL-C", "HDL-C", "TG", "T-CHO"],
+    "liver": ["ALT(GPT)", "AST(GOT)", "ALP", "T-Bil", "D-Bil"],
+    "kidney": ["CRE", "UN", "Alb/CRE Ratio"],
+    "general": ["Hb", "Hct", "PLT", "WBC", "RBC", "hsCRP"]
+}
+
+CATEGORY_LABELS = {
+    "blood_sugar": "血糖",
+    "lipid": "血脂",
+    "liver": "肝功能",
+    "kidney": "腎功能",
+    "general": "血液常規"
+}
+
+DEFAULT_DOCS = {
+    "blood_sugar": "血糖正常範圍：飯前血糖 70-100 mg/dL，糖化血紅蛋白 4%-6%。",
+    "lipid": "血脂正常值：總膽固醇 < 200 mg/dL，低密度脂蛋白膽固醇 < 120 mg/dL，高密度脂蛋白膽固醇 > 40 mg/dL三酸甘油酯 < 150 mg/dL。",
+    "liver": "肝功能正常範圍：丙氨酸轉氨酶 0-50 U/L，天門冬氨酸轉氨酶 0-50 U/L，總膽紅素 0.3-1.2 mg/dL。",
+    "kidney": "腎功能正常範圍：肌酐 0.6-1.2 mg/dL，尿素氮 7-20 mg/dL，白蛋白/肌酐比率 < 30 mg/g。",
+    "general": "血液常規正常範圍：血紅蛋白 12-16 g/dL，白細胞 4-10 x10^3/uL，血小板 150-450 x10^3/uL，高敏感C反應蛋白 < 1 mg/dL。"
+}
+
+# 提示版面：固定不變的前綴（角色、任務、醫療背景、輸出規則）在前，每份報告不同的資料在最後，
+# 連續請求的提示開頭逐字相同，Ollama 可重用前綴的 KV 快取，只需計算尾端的報告資料
+METRIC_NAMES = "飯前血糖 (Glu-AC), 糖化血紅蛋白 (HbA1c), 飯後血糖 (Glu-PC), 總膽固醇 (T-CHO), 低密度脂蛋白膽固醇 (LDL-C), 高密度脂蛋白膽固醇 (HDL-C), 三酸甘油酯 (TG), 尿素氮 (UN), 高敏感C反應蛋白 (hsCRP), 血壓 (BP)"
+
+# 資料範圍說明需與 PROMPT_ABNORMAL_ONLY 一致：關閉時送入全部指標，不可宣稱只列出異常指標
+if PROMPT_ABNORMAL_ONLY:
+    DATA_SCOPE = (
+        "資料中僅列出異常或臨界的指標（括號內為判定結果與參考範圍），未列出的已檢測指標均在正常範圍內；"
+        "標示為未檢測的指標沒有檢驗結果，不得描述為正常或推測其數值。"
+    )
+else:
+    DATA_SCOPE = "資料中列出全部檢驗指標，請自行與參考範圍比較以判斷是否異常。"
+
+MEDICAL_BACKGROUND = """
+    **醫療背景**（僅供參考，優先使用上下文）：
+    - 低密度脂蛋白膽固醇（LDL-C）正常範圍 < 120 mg/dL，偏高可能增加心血管疾病風險。
+    - 高密度脂蛋白膽固醇（HDL-C）正常範圍 > 40 mg/dL，偏低可能影響心血管健康。
+    - 飯前血糖（Glu-AC）正常範圍 70-100 mg/dL，偏高可能提示糖尿病風險。
+    - 糖化血紅蛋白（HbA1c）正常範圍 4%-6%，偏高可能表示長期血糖控制問題。
+    - 血壓正常範圍：收縮壓 < 120 mmHg，舒張壓 < 80 mmHg。
+    - 尿素氮（UN）正常範圍 7-20 mg/dL，偏高可能提示腎功能問題。
+    - 高敏感C反應蛋白（hsCRP）正常範圍 < 1 mg/dL，偏高可能提示炎症或心血管風險。"""
+
+HYDE_PROMPT_PREFIX = f"""
+    根據健康檢查資料，生成一段假設性健康總結（使用繁體中文）。{DATA_SCOPE}
+    例如：這位患者的血糖控制良好，但低密度脂蛋白膽固醇偏高，可能有心血管風險。
+    **注意**：
+    - 必須完全使用繁體中文，不得包含英文或其他語言詞彙。
+    - 指標名稱必須使用以下中文名稱：{METRIC_NAMES}。
+    - 僅基於提供的健康檢查資料進行總結，不得假設或添加未提供的數據（如腦中風或虛構指標）。
+    - 總結應簡潔並聚焦於主要指標。"""
+
+HYDE_PROMPT_DATA = """
+    健康檢查資料：
+    {query}
+"""
+
+# 輸出格式由 analysis_schema 中的 JSON Schema 透過 Ollama format 參數約束，提示僅保留內容要求
+USER_PROMPT_PREFIX = f"""
+    你是一位醫療助理，負責分析用戶的健康檢查資料。{DATA_SCOPE}
+    請提供一個詳細的健康總結（逐項分析列出的指標，與上下文中的正常範圍比較，說明潛在影響），具體的改善建議（針對異常指標提供飲食、運動、醫療監測建議），並推薦至少兩種合適的保單類型，以 JSON 回應。{MEDICAL_BACKGROUND}
+    **注意**：
+    - summary 和 advice 必須完全使用繁體中文，指標名稱使用中文名稱：{METRIC_NAMES}。
+    - recommended_policies 僅包含與檢查結果相關的保單名稱。
+    - 僅使用提供的健康檢查資料進行分析，不得假設或添加未提供的數據或診斷（如腦中風）。
+    - 飲食建議需具體，例如每日鹽分攝入量應少於 5 克。
+    - 運動建議需具體，例如每週至少 150 分鐘中等強度運動。
+    - 醫療監測建議需具體，例如每三個月檢查一次血脂。"""
+
+USER_PROMPT_DATA = """
+    用戶的健康檢查資料：
+    {query}
+    參考上下文（若無則忽略）：
+    {context}
+"""
+
+INSURER_PROMPT_PREFIX = f"""
+    作為保險公司分析師，你負責審閱體檢資料。{DATA_SCOPE}
+    疾病風險已由規則引擎依指標數值評估並附於資料之後，請據此撰寫整體健康摘要（說明異常指標的潛在影響與長期風險），並提出承保建議，以 JSON 回應。{MEDICAL_BACKGROUND}
+    **注意**：
+    - summary 與 insurance_suitability 必須完全使用繁體中文，指標名稱使用中文名稱：{METRIC_NAMES}。
+    - 風險判斷以規則引擎的評估為準，不得新增或更改風險等級。
+    - 僅使用提供的健康檢查資料進行分析，不得假設或添加未提供的數據（如腦中風）。"""
+
+INSURER_PROMPT_DATA = """
+    體檢資料：
+    {query}
+    參考上下文（若無則忽略）：
+    {context}
+"""
+
+PROMPT_LAYOUTS = {
+    "hyde": (HYDE_PROMPT_PREFIX, HYDE_PROMPT_DATA),
+    "user": (USER_PROMPT_PREFIX, USER_PROMPT_DATA),
+    "insurer": (INSURER_PROMPT_PREFIX, INSURER_PROMPT_DATA)
+}
+
+HYDE_PROMPT = PromptTemplate.from_template(HYDE_PROMPT_PREFIX + HYDE_PROMPT_DATA)
+USER_PROMPT = PromptTemplate.from_template(USER_PROMPT_PREFIX + USER_PROMPT_DATA)
+INSURER_PROMPT = PromptTemplate.from_template(INSURER_PROMPT_PREFIX + INSURER_PROMPT_DATA)
+
+PROMPTS = {"user": USER_PROMPT, "insurer": INSURER_PROMPT}
+
 class HealthAnalysisServicer(data_pb2_grpc.HealthServiceServicer):
     def __init__(self):
-        embedding = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        # 查詢嵌入經由快取，重複的類別子查詢不必重新計算
+        self.embedding = CachedEmbeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"))
         self.vectorstore = Chroma(
             persist_directory="D:/gg/chroma_db",
-            embedding_function=embedding,
+            embedding_function=self.embedding,
             collection_name="health_knowledge"
         )
-        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 3})
-        self.llm = OllamaLLM(model="llama3:8b", base_url="http://localhost:11434")
+        # 相同查詢的檢索結果由快取提供；知識庫寫入時更新版本計數器使其失效
+        self.kb_version = KnowledgeBaseVersion("D:/gg/chroma_db")
+        self.retrieval_cache = RetrievalCache(self.vectorstore, self.kb_version)
+        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+        # 各階段（HyDE、用戶摘要、保險公司分析）的模型由 ModelRegistry 依設定提供，
+        # 所有 LLM 呼叫經由共用的 LLM 閘道，chain 在此預先建立一次
+        self.gateway = get_gateway()
+        self.models = self.gateway.models
+        self.llms = {stage: self.models.get(stage) for stage in (HYDE, USER_SUMMARY, INSURER_ANALYSIS)}
+        self.brownout_llm = self.models.create(BROWNOUT_MODEL) if BROWNOUT_MODEL else None
+        self.register_chains()
+        self.hyde_counts = {"forced": 0, "low_recall": 0, "skipped": 0}
+        self.hyde_lock = threading.Lock()
+        self.init_concurrency()
+        self.context_assembler = ContextAssembler(token_budget=CONTEXT_TOKEN_BUDGET, passage_tokens=CONTEXT_PASSAGE_TOKENS)
+        self.context_cache = LRUTTLCache(max_size=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL)
+        self.response_cache = ResponseCache(RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_MAX_ENTRIES)
+        self.brownout = BrownoutController(
+            enter_depth=BROWNOUT_ENTER_DEPTH, exit_depth=BROWNOUT_EXIT_DEPTH, min_hold=BROWNOUT_MIN_HOLD
+        )
         self.translations = {
             "Glu-AC": "飯前血糖", "HbA1c": "糖化血紅蛋白", "Glu-PC": "飯後血糖", "Alb": "白蛋白", "TP": "總蛋白",
             "AST(GOT)": "天門冬氨酸轉氨酶", "ALT(GPT)": "丙氨酸轉氨酶", "D-Bil": "直接膽紅素", "ALP": "鹼性磷酸酶",
@@ -40,34 +245,38 @@ class HealthAnalysisServicer(data_pb2_grpc.HealthServiceServicer):
             "Creatinine (Dipstick)": "肌酐 (試紙)", "Alb/CRE Ratio": "白蛋白/肌酐比率", "Nitrite": "亞硝酸鹽", "Occult Blood": "潛血",
             "WBC Esterase": "白細胞酯酶"
         }
+        # 各類別的參考範圍文字，依 reference_ranges 預先產生；指標全部正常的類別直接使用，不做向量檢索
+        self.reference_docs = {
+            category: f"{CATEGORY_LABELS[category]}參考範圍：" + "，".join(
+                f"{self.translations.get(key, key)} {format_reference(*REFERENCE_RANGES[key])}"
+                for key in keys if key in REFERENCE_RANGES
+            ) + "。"
+            for category, keys in QUERY_CATEGORIES.items()
+        }
         self.policy_translations = {
             "LIFE INSURANCE": "壽險",
             "HEALTH INSURANCE": "健康險",
             "Health Insurance": "健康險",
             "Life Insurance": "壽險"
         }
+        logger.info(f"模型設定：{self.models.describe()}")
+        if self.models.pool is not None:
+            logger.info(f"Ollama 後端池：{', '.join(self.models.pool.urls)}")
         logger.info("🚀 初始化完成")
 
+    def init_concurrency(self):
+        """建立執行緒模式使用的准入控制、single-flight 與執行緒池；grpc.aio 版本覆寫為協程版本。"""
+        # HyDE 生成與類別檢索並行扇出用的執行緒池
+        self.retrieval_executor = futures.ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        self.admission = AdmissionController(max_concurrent=LLM_MAX_CONCURRENT, max_queue=LLM_MAX_QUEUE)
+        self.single_flight = SingleFlight()
+
     def clean_json(self, text):
         if not text or not isinstance(text, str):
             return None
-        # 移除無效字符和額外文字
-        text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        # 移除 JSON 以外的內容（如 "Note:" 或其他評論）
-        text = re.sub(r'}[^}]*$', '}', text)
-        json_match = re.search(r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}', text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                return None
-        return None
-
-    def extract_json(self, text):
-        cleaned = self.clean_json(text)
-        return json.dumps(cleaned, ensure_ascii=False) if cleaned else None
+        # 以巢狀感知的解析器取出第一個完整 JSON 物件，忽略前後的說明文字（如 "Note:"）
+        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', text)
+        return parse_first_object(text)
 
     def clean_metrics(self, metrics, original_metrics):
         if not isinstance(metrics, dict):
@@ -104,265 +313,911 @@ class HealthAnalysisServicer(data_pb2_grpc.HealthServiceServicer):
             return policies
         return [self.policy_translations.get(policy, policy) for policy in policies]
 
-    def translate_risks(self, risks):
-        if not isinstance(risks, list):
-            return risks
-        translated_risks = []
-        for risk in risks:
-            translated_risk = risk.copy()
-            disease = risk.get("disease", "未知")
-            if not disease:
-                translated_risk["disease"] = "潛在代謝疾病"
-                translated_risk["impact"] = "中度"
-                translated_risk["description"] = "本次體檢結果顯示低密度脂蛋白膽固醇和尿素氮值偏高，可能表明有心血管或腎功能風險。"
-            else:
-                description = risk.get("description", "無描述")
-                for eng, chi in self.translations.items():
-                    description = description.replace(eng, chi)
-                translated_risk["description"] = description
-            translated_risks.append(translated_risk)
-        return translated_risks
+    def register_chains(self):
+        self.gateway.register("hyde", HYDE_PROMPT, stage=HYDE)
+        for audience, stage in AUDIENCE_STAGES.items():
+            # 以 JSON Schema 約束生成格式，輸出必為符合 Schema 的單一 JSON 物件
+            self.gateway.register(audience, PROMPTS[audience], stage=stage, format=ANALYSIS_SCHEMAS[audience])
+            if BROWNOUT_MODEL:
+                self.gateway.register(
+                    f"{audience}_brownout", PROMPTS[audience], model=BROWNOUT_MODEL, format=ANALYSIS_SCHEMAS[audience]
+                )
 
     def generate_hypothetical_doc(self, query_text):
-        hyde_prompt = PromptTemplate.from_template("""
-            根據以下健康檢查資料，生成一段假設性健康總結（使用繁體中文）：
-            {query}
-            例如：這位患者的血糖控制良好，但低密度脂蛋白膽固醇偏高，可能有心血管風險。
-            **注意**：
-            - 必須完全使用繁體中文，不得包含英文或其他語言詞彙。
-            - 指標名稱必須使用以下中文名稱：飯前血糖 (Glu-AC), 糖化血紅蛋白 (HbA1c), 飯後血糖 (Glu-PC), 總膽固醇 (T-CHO), 低密度脂蛋白膽固醇 (LDL-C), 高密度脂蛋白膽固醇 (HDL-C), 三酸甘油酯 (TG), 尿素氮 (UN), 高敏感C反應蛋白 (hsCRP), 血壓 (BP)。
-            - 僅基於提供的健康檢查資料進行總結，不得假設或添加未提供的數據（如腦中風或虛構指標）。
-            - 總結應簡潔並聚焦於主要指標。
-        """)
-        chain = hyde_prompt | self.llm
-        hypothetical_doc = chain.invoke({"query": query_text})
+        hypothetical_doc = self.gateway.invoke("hyde", {"query": query_text})
         logger.info(f"HyDE 假設性文件：{hypothetical_doc}")
         return hypothetical_doc.strip()
 
-    def get_multi_query_context(self, test_results):
-        query_categories = {
-            "blood_sugar": ["Glu-AC", "HbA1c", "Glu-PC"],
-            "lipid": ["LDL-C", "HDL-C", "TG", "T-CHO"],
-            "liver": ["ALT(GPT)", "AST(GOT)", "ALP", "T-Bil", "D-Bil"],
-            "kidney": ["CRE", "UN", "Alb/CRE Ratio"],
-            "general": ["Hb", "Hct", "PLT", "WBC", "RBC", "hsCRP"]
-        }
-        all_docs = []
-        default_docs = {
-            "blood_sugar": "血糖正常範圍：飯前血糖 70-100 mg/dL，糖化血紅蛋白 4%-6%。",
-            "lipid": "血脂正常值：總膽固醇 < 200 mg/dL，低密度脂蛋白膽固醇 < 120 mg/dL，高密度脂蛋白膽固醇 > 40 mg/dL三酸甘油酯 < 150 mg/dL。",
-            "liver": "肝功能正常範圍：丙氨酸轉氨酶 0-50 U/L，天門冬氨酸轉氨酶 0-50 U/L，總膽紅素 0.3-1.2 mg/dL。",
-            "kidney": "腎功能正常範圍：肌酐 0.6-1.2 mg/dL，尿素氮 7-20 mg/dL，白蛋白/肌酐比率 < 30 mg/g。",
-            "general": "血液常規正常範圍：血紅蛋白 12-16 g/dL，白細胞 4-10 x10^3/uL，血小板 150-450 x10^3/uL，高敏感C反應蛋白 < 1 mg/dL。"
-        }
-        for category, keys in query_categories.items():
-            category_query = "\n".join([f"{k}: {v}" for k, v in test_results.items() if k in keys])
-            if category_query:
-                logger.info(f"Multi-Query 子查詢 ({category})：{category_query}")
-                docs_with_scores = self.vectorstore.similarity_search_with_score(category_query, k=3)
-                filtered_docs = [doc for doc, score in docs_with_scores if score < 0.7]
-                cleaned_docs = [re.sub(r'問題:.*\n回答:', '', doc.page_content.strip(), flags=re.DOTALL) for doc in filtered_docs if doc.page_content]
-                if not cleaned_docs:
-                    cleaned_docs = [default_docs[category]]
-                logger.info(f"Multi-Query 子查詢 ({category}) 結果：{cleaned_docs}")
-                all_docs.extend(cleaned_docs)
-        context = "\n".join(all_docs) if all_docs else "無相關參考資料"
-        return context
+    def clean_docs(self, docs_with_scores):
+        """分數低於門檻的檢索結果轉為 Passage，去掉問答文件的「問題:」部分。"""
+        return [
+            Passage(re.sub(r'問題:.*\n回答:', '', doc.page_content.strip(), flags=re.DOTALL), score, doc.id)
+            for doc, score in docs_with_scores if score < SCORE_THRESHOLD and doc.page_content
+        ]
+
+    def batch_similarity_search(self, queries, k=RETRIEVAL_K):
+        """依輸入順序回傳各查詢的 (Document, score) 列表；未命中快取的查詢以單次嵌入前向計算與單次 Chroma 查詢處理。"""
+        if not queries:
+            return []
+        return self.retrieval_cache.batch_similarity_search(queries, k)
+
+    def build_category_queries(self, test_results):
+        """回傳 (需向量檢索的類別子查詢, 指標全部正常的類別)。"""
+        category_queries = []
+        normal_categories = []
+        for category, keys in QUERY_CATEGORIES.items():
+            metrics = [(k, v) for k, v in test_results.items() if k in keys]
+            if not metrics:
+                continue
+            if RETRIEVAL_ABNORMAL_ONLY and not any(
+                evaluate_metric(k, v).status in NOTABLE_STATUSES for k, v in metrics
+            ):
+                normal_categories.append(category)
+                continue
+            category_query = "\n".join([f"{k}: {v}" for k, v in metrics])
+            logger.info(f"Multi-Query 子查詢 ({category})：{category_query}")
+            category_queries.append((category, category_query))
+        if normal_categories:
+            logger.info(f"指標全部正常、略過檢索的類別：{normal_categories}")
+        return category_queries, normal_categories
+
+    def format_multi_query_context(self, category_queries, normal_categories, results):
+        """回傳 (段落列表, 分數低於門檻的文件數)；沒有命中的類別以預設文件補上（排在檢索結果之後），不計入命中數。
+        指標全部正常的類別使用預先產生的參考範圍文字；完全沒有向量檢索時命中數為 None。"""
+        all_docs = [
+            Passage(self.reference_docs[category], SCORE_THRESHOLD, f"reference:{category}")
+            for category in normal_categories
+        ]
+        matched = 0 if category_queries else None
+        for (category, _), docs_with_scores in zip(category_queries, results):
+            cleaned_docs = self.clean_docs(docs_with_scores)
+            matched += len(cleaned_docs)
+            if not cleaned_docs:
+                cleaned_docs = [Passage(DEFAULT_DOCS[category], SCORE_THRESHOLD, f"default:{category}")]
+            logger.info(f"Multi-Query 子查詢 ({category}) 結果：{[doc.text for doc in cleaned_docs]}")
+            all_docs.extend(cleaned_docs)
+        return all_docs, matched
+
+    def retrieve_multi_query(self, test_results_list, hypothetical_docs=None, k=RETRIEVAL_K):
+        """回傳各報告的 (段落列表, 類別子查詢命中文件數)。"""
+        # 多份報告的所有類別子查詢（以及已有的 HyDE 文本或模板摘要）合併為一次嵌入、一次檢索
+        hypothetical_docs = hypothetical_docs or [None] * len(test_results_list)
+        report_queries = [self.build_category_queries(test_results) for test_results in test_results_list]
+        queries = [category_query for category_queries, _ in report_queries for _, category_query in category_queries]
+        queries.extend(doc for doc in hypothetical_docs if doc)
+        results = iter(self.batch_similarity_search(queries, k))
+
+        contexts = [
+            self.format_multi_query_context(category_queries, normal_categories, [next(results) for _ in category_queries])
+            for category_queries, normal_categories in report_queries
+        ]
+        for i, hypothetical_doc in enumerate(hypothetical_docs):
+            if hypothetical_doc:
+                passages, matched = contexts[i]
+                contexts[i] = (passages + self.format_hyde_context(next(results)), matched)
+        return contexts
+
+    def get_multi_query_contexts(self, test_results_list, hypothetical_docs=None, k=RETRIEVAL_K):
+        return [passages for passages, _ in self.retrieve_multi_query(test_results_list, hypothetical_docs, k)]
+
+    def get_multi_query_context(self, test_results, hypothetical_doc=None, k=RETRIEVAL_K):
+        return self.get_multi_query_contexts([test_results], [hypothetical_doc], k)[0]
+
+    def format_hyde_context(self, docs_with_scores):
+        hyde_docs = self.clean_docs(docs_with_scores)
+        logger.info(f"HyDE 檢索結果：{[doc.text for doc in hyde_docs]}")
+        return hyde_docs
+
+    def merge_context(self, multi_query_context, hyde_context):
+        """合併類別檢索與 HyDE 的段落：去重、依分數排序並限制在 CONTEXT_TOKEN_BUDGET 內。"""
+        context_text = self.context_assembler.assemble(multi_query_context + hyde_context)
+        logger.info(f"合併上下文：{context_text}")
+        return context_text
+
+    def get_hyde_context(self, query_text):
+        hypothetical_doc = self.generate_hypothetical_doc(query_text)
+        return self.format_hyde_context(self.batch_similarity_search([hypothetical_doc])[0])
+
+    def templated_summary(self, test_results):
+        """HyDE 的低成本替代：由異常指標與規則引擎風險組成的摘要，與類別子查詢一起嵌入檢索。"""
+        notable = [
+            f"{self.translations.get(finding.name, finding.name)}{finding.status}"
+            for finding in evaluate_results(test_results) if finding.status in NOTABLE_STATUSES
+        ]
+        diseases = [risk["disease"] for risk in assess_risks(test_results)]
+        if not notable and not diseases:
+            # 全部正常的報告不需要額外檢索
+            return None
+        summary = f"健康檢查顯示{'、'.join(notable)}。" if notable else "健康檢查各項指標均在正常範圍內。"
+        if diseases:
+            summary += f"需注意{'、'.join(diseases)}的風險，以及相關的飲食、運動與追蹤檢查建議。"
+        return summary
+
+    def should_run_hyde(self, use_hyde, matched):
+        """決定是否執行 HyDE 並更新計數：請求指定 use_hyde，或類別檢索命中文件少於 HYDE_MIN_DOCS 篇時執行。
+        matched 為 None 表示所有類別指標皆正常、未做類別檢索，不需要 HyDE。"""
+        if use_hyde:
+            reason = "forced"
+        elif matched is not None and matched < HYDE_MIN_DOCS:
+            reason = "low_recall"
+        else:
+            reason = "skipped"
+        with self.hyde_lock:
+            self.hyde_counts[reason] += 1
+        hits = "未檢索" if matched is None else f"命中 {matched} 篇"
+        logger.info(f"HyDE {'略過' if reason == 'skipped' else '執行'}（{reason}，類別檢索{hits}）")
+        return reason != "skipped"
+
+    def build_context(self, test_results, query_text, use_hyde=False):
+        # 指定 use_hyde 時 HyDE 一定會執行，先送出，與批次類別檢索同時進行
+        hyde_future = self.retrieval_executor.submit(self.get_hyde_context, query_text) if use_hyde else None
+        (multi_query_context, matched), = self.retrieve_multi_query([test_results], [self.templated_summary(test_results)])
+        logger.info(f"Multi-Query 檢索結果：{len(multi_query_context)} 個段落")
+        hyde_context = []
+        if self.should_run_hyde(use_hyde, matched):
+            hyde_context = hyde_future.result() if hyde_future is not None else self.get_hyde_context(query_text)
+        return self.merge_context(multi_query_context, hyde_context)
+
+    def knowledge_base_version(self):
+        # 知識庫寫入後版本計數器遞增，舊的檢索上下文隨之失效
+        return self.kb_version.current()
+
+    def context_cache_key(self, test_results, use_hyde=False):
+        return canonical_hash(canonical_results(test_results), self.knowledge_base_version(), use_hyde)
+
+    def get_cached_context(self, test_results, query_text, degraded=False, use_hyde=False):
+        cache_key = self.context_cache_key(test_results, use_hyde)
+        context_text = self.context_cache.get(cache_key)
+        if context_text is not None:
+            logger.info(f"檢索上下文快取命中：{cache_key[:12]}")
+            return context_text
+        if degraded:
+            # 降級模式：不生成 HyDE、縮小 k，且不快取品質較低的上下文
+            return self.merge_context(self.get_multi_query_context(test_results, k=BROWNOUT_RETRIEVAL_K), [])
+        context_text = self.build_context(test_results, query_text, use_hyde)
+        self.context_cache.set(cache_key, context_text)
+        return context_text
+
+    def parse_request(self, request, audience="user"):
+        test_results = json.loads(request.test_results_json)
+        if PROMPT_ABNORMAL_ONLY:
+            query_text = summarize_findings(evaluate_results(test_results))
+        else:
+            query_text = "\n".join([f"{k}: {v}" for k, v in test_results.items()])
+        if audience == "insurer":
+            # 保險公司分析附上規則引擎的風險評估，LLM 僅需撰寫摘要與承保建議
+            query_text += f"\n規則引擎評估的疾病風險：\n{format_risks(assess_risks(test_results, self.translations))}"
+        return test_results, query_text
+
+    def analysis_chain(self, audience, degraded=False):
+        """分析使用的 LLM 閘道 chain 名稱；降級模式且設定了 BROWNOUT_MODEL 時改用小模型。"""
+        return f"{audience}_brownout" if degraded and self.brownout_llm is not None else audience
+
+    def parse_analysis(self, audience, result):
+        result_json = self.clean_json(result)
+        if result_json is None:
+            logger.warning("無法提取有效 JSON")
+            return None
+        errors = validate(result_json, ANALYSIS_SCHEMAS[audience])
+        if errors:
+            logger.warning(f"LLM 回應不符合 Schema：{errors}")
+            return None
+        return result_json
+
+    def build_user_response(self, result, brownout=False):
+        logger.info(f"Raw LLM result: {result}")
+        result_json = self.parse_analysis("user", result)
+        if result_json is None:
+            logger.warning("使用預設回應")
+            result_json = {
+                "summary": "您的健康數據分析中，部分指標需要進一步確認。",
+                "advice": "建議定期進行健康檢查，並諮詢專業醫師以獲得更詳細的建議。",
+                "recommended_policies": ["健康險", "壽險"]
+            }
+
+        result_json["summary"] = self.translate_text(result_json.get("summary", "無法分析"))
+        result_json["advice"] = self.translate_text(result_json.get("advice", "無建議"))
+        recommended_policies = self.translate_policies(result_json.get("recommended_policies", []))
+        result_json["recommended_policies"] = recommended_policies if recommended_policies else ["健康險", "壽險"]
+
+        return data_pb2.UserHealthAnalysisResponse(
+            summary=result_json.get("summary", "無法分析"),
+            advice=result_json.get("advice", "無建議"),
+            recommended_policy=", ".join(recommended_policies) if recommended_policies else "無推薦保單",
+            success=True,
+            brownout=brownout
+        )
+
+    def risks_proto(self, risks):
+        if not risks:
+            return [data_pb2.Risk(disease="無明顯疾病風險", impact="無", description="各項指標未見需關注的異常。")]
+        return [
+            data_pb2.Risk(disease=r["disease"], impact=r["impact"], description=r["description"])
+            for r in risks
+        ]
+
+    def metrics_text(self, test_results):
+        metrics = self.clean_metrics(test_results, test_results)
+        return ", ".join([f"{k}: {v}" for k, v in metrics.items()])
+
+    def build_insurer_response(self, result, test_results, brownout=False):
+        logger.info(f"Raw LLM result: {result}")
+        result_json = self.parse_analysis("insurer", result)
+        if result_json is None:
+            # LLM 敘述不符合 Schema 時仍回傳規則引擎已算出的風險與保單，僅摘要改為規則引擎的文字
+            logger.warning("LLM 回應無法解析，改以規則引擎結果回應")
+            response = self.risks_only_response(test_results)
+            if brownout:
+                response.brownout = True
+            return response
+
+        # 風險與保單種類由規則引擎依原始檢驗數值計算，LLM 僅提供摘要與承保建議
+        risks = assess_risks(test_results, self.translations)
+        summary = self.translate_text(result_json.get("summary", "").strip() or "無摘要")
+        insurance_suitability = self.translate_text(
+            result_json.get("insurance_suitability", "").strip() or underwriting_suggestion(risks)
+        )
+
+        return data_pb2.InsurerHealthAnalysisResponse(
+            summary=summary,
+            metrics=self.metrics_text(test_results),
+            policy_type=", ".join(recommend_policies(risks)),
+            risks=self.risks_proto(risks),
+            insurance_suitability=insurance_suitability,
+            success=True,
+            brownout=brownout
+        )
+
+    def risks_only_response(self, test_results):
+        """僅風險模式：完全由規則引擎產生回應，不呼叫 LLM。"""
+        risks = assess_risks(test_results, self.translations)
+        if risks:
+            summary = f"規則引擎評估發現 {len(risks)} 項疾病風險：" + "、".join(
+                f"{r['disease']}（{r['impact']}）" for r in risks
+            ) + "。"
+        else:
+            summary = "規則引擎評估未發現明顯疾病風險。"
+        return data_pb2.InsurerHealthAnalysisResponse(
+            summary=summary,
+            metrics=self.metrics_text(test_results),
+            policy_type=", ".join(recommend_policies(risks)),
+            risks=self.risks_proto(risks),
+            insurance_suitability=underwriting_suggestion(risks),
+            success=True
+        )
+
+    def user_failure_response(self):
+        return data_pb2.UserHealthAnalysisResponse(
+            summary="分析失敗",
+            advice="請稍後重試",
+            recommended_policy="無推薦保單",
+            success=False
+        )
+
+    def insurer_failure_response(self):
+        return data_pb2.InsurerHealthAnalysisResponse(
+            summary="分析失敗",
+            metrics="異常",
+            policy_type="無法推薦保單",
+            risks=[data_pb2.Risk(disease="未知", impact="無", description="分析失敗")],
+            insurance_suitability="請人工審核",
+            success=False
+        )
+
+    def response_cache_key(self, audience, test_results):
+        llm = self.llms[AUDIENCE_STAGES[audience]]
+        return canonical_hash(
+            PROMPT_VERSIONS[audience], PROMPT_ABNORMAL_ONLY, llm.model, llm.temperature, canonical_results(test_results)
+        )
+
+    def get_cached_response(self, cache_key):
+        result = self.response_cache.get(cache_key)
+        logger.info(f"回應快取{'命中' if result is not None else '未命中'}：累計命中 {self.response_cache.hits} 次，未命中 {self.response_cache.misses} 次")
+        return result
+
+    def cache_response(self, audience, cache_key, result):
+        # 僅快取符合 Schema 的回應，避免重複回傳預設內容
+        if self.parse_analysis(audience, result) is not None:
+            self.response_cache.set(cache_key, result)
+
+    def generate_analysis(self, audience, context_text, query_text, degraded=False, cancelled=None):
+        """cancelled（threading.Event）被設定時於下一個 token 停止生成，釋放 Ollama。"""
+        parser = StreamingJSONParser()
+        stream = self.gateway.stream(self.analysis_chain(audience, degraded), {"query": query_text, "context": context_text})
+        try:
+            for token in stream:
+                if cancelled is not None and cancelled.is_set():
+                    break
+                if parser.feed(token):
+                    logger.info("JSON 物件已完整，提前結束生成")
+                    break
+        finally:
+            stream.close()
+        return parser.text
+
+    def run_analysis(self, audience, test_results, query_text, context, cache_key, degraded=False, use_hyde=False):
+        # 相同 (RPC, 正規化檢驗結果, 流程) 的同時請求只執行一次生成，其餘在自身的 deadline 內等待並共用結果；
+        # 降級與 HyDE 設定不同的請求產生的內容不同，不可互相共用
+        return self.single_flight.do(
+            (cache_key, degraded, use_hyde),
+            lambda: self.compute_analysis(audience, test_results, query_text, cache_key, context, degraded, use_hyde),
+            timeout=context.time_remaining()
+        )
+
+    def compute_analysis(self, audience, test_results, query_text, cache_key, context, degraded=False, use_hyde=False):
+        # 取得名額後才開始檢索與生成（HyDE 與最終分析），排不到名額時不浪費任何運算
+        with self.admission.slot(PRIORITIES[audience], timeout=context.time_remaining()):
+            context_text = self.get_cached_context(test_results, query_text, degraded, use_hyde)
+            result = self.generate_analysis(audience, context_text, query_text, degraded)
+        if not degraded:
+            self.cache_response(audience, cache_key, result)
+        return result
+
+    def stream_analysis(self, audience, test_results, query_text, context, cache_key, degraded=False, use_hyde=False):
+        with self.admission.slot(PRIORITIES[audience], timeout=context.time_remaining()):
+            context_text = self.get_cached_context(test_results, query_text, degraded, use_hyde)
+            # 逐 token 轉發 LLM 生成內容；客戶端斷線或 JSON 物件閉合時停止生成
+            parser = StreamingJSONParser()
+            stream = self.gateway.stream(
+                self.analysis_chain(audience, degraded), {"query": query_text, "context": context_text},
+                timeout=context.time_remaining()
+            )
+            try:
+                for token in stream:
+                    if not context.is_active():
+                        logger.info("客戶端已取消串流，停止生成")
+                        return
+                    yield token
+                    if parser.feed(token):
+                        logger.info("JSON 物件已完整，提前結束生成")
+                        break
+            finally:
+                stream.close()
+        if not degraded:
+            self.cache_response(audience, cache_key, parser.text)
+
+    def select_pipeline(self):
+        """依 LLM 准入佇列的排隊數決定本次請求是否走降級流程，回傳 True 表示降級；快取命中的請求不需呼叫。"""
+        degraded, changed = self.brownout.update(self.admission.stats()["queue_depth"])
+        if changed:
+            if degraded:
+                logger.warning(f"LLM 排隊數達到 {BROWNOUT_ENTER_DEPTH}，進入降級模式（略過 HyDE、k={BROWNOUT_RETRIEVAL_K}）")
+            else:
+                logger.info("LLM 負載下降，恢復完整分析流程")
+        return degraded
+
+    def queue_stats_response(self, response_cache):
+        """response_cache 為 ResponseCache.stats() 的結果；其中的 COUNT 查詢由呼叫端決定在哪個執行緒執行。"""
+        stats = self.admission.stats()
+        brownout = self.brownout.stats()
+        return data_pb2.AnalysisQueueStats(
+            queue_depth=stats["queue_depth"],
+            active=stats["active"],
+            max_concurrent=stats["max_concurrent"],
+            max_queue=stats["max_queue"],
+            admitted=stats["admitted"],
+            rejected=stats["rejected"],
+            avg_wait_ms=stats["avg_wait"] * 1000,
+            last_wait_ms=stats["last_wait"] * 1000,
+            estimated_wait_ms=stats["estimated_wait"] * 1000,
+            brownout=brownout["active"],
+            brownout_transitions=brownout["transitions"],
+            brownout_requests=brownout["degraded_requests"],
+            brownout_enter_depth=brownout["enter_depth"],
+            hyde_forced=self.hyde_counts["forced"],
+            hyde_low_recall=self.hyde_counts["low_recall"],
+            hyde_skipped=self.hyde_counts["skipped"],
+            response_cache_hits=response_cache["hits"],
+            response_cache_misses=response_cache["misses"],
+            response_cache_hit_rate=response_cache["hit_rate"],
+            response_cache_entries=response_cache["entries"]
+        )
+
+    def reject(self, context, error):
+        if isinstance(error, AdmissionDeadlineExceeded):
+            logger.warning(f"請求逾時，不再分析：{error}")
+            context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(error))
+        logger.warning(f"LLM 佇列已滿，拒絕請求：{error}")
+        context.set_trailing_metadata((("retry-after-ms", str(int(error.retry_after * 1000))),))
+        context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(error))
+
+    def prepare_batch(self, request):
+        """解析批次中的各報告並查詢回應快取，回傳 (已完成結果, 待分析項目)；
+        待分析項目中缺少檢索上下文的報告，其類別子查詢合併為一次批次檢索。"""
+        if len(request.reports) > BATCH_MAX_REPORTS:
+            raise ValueError(f"單次批次最多 {BATCH_MAX_REPORTS} 份報告")
+        finished, pending = [], []
+        for report in request.reports:
+            try:
+                test_results, query_text = self.parse_request(report, "insurer")
+            except Exception as e:
+                logger.error(f"批次分析報告 {report.report_id} 解析失敗：{e}")
+                finished.append((report.report_id, self.insurer_failure_response()))
+                continue
+            if report.risks_only:
+                finished.append((report.report_id, self.risks_only_response(test_results)))
+                continue
+            cache_key = self.response_cache_key("insurer", test_results)
+            result = self.get_cached_response(cache_key)
+            if result is not None:
+                finished.append((report.report_id, self.build_insurer_response(result, test_results)))
+                continue
+            context_key = self.context_cache_key(test_results, report.use_hyde)
+            pending.append({
+                "report_id": report.report_id,
+                "test_results": test_results,
+                "query_text": query_text,
+                "cache_key": cache_key,
+                "context_key": context_key,
+                "context_text": self.context_cache.get(context_key),
+                "multi_query_context": None,
+                "matched": 0,
+                "use_hyde": report.use_hyde
+            })
+        return finished, pending
+
+    def fill_batch_multi_query_contexts(self, pending, degraded=False):
+        missing = [item for item in pending if item["context_text"] is None]
+        if missing:
+            test_results_list = [item["test_results"] for item in missing]
+            if degraded:
+                contexts = self.retrieve_multi_query(test_results_list, k=BROWNOUT_RETRIEVAL_K)
+            else:
+                summaries = [self.templated_summary(test_results) for test_results in test_results_list]
+                contexts = self.retrieve_multi_query(test_results_list, summaries)
+            for item, (multi_query_context, matched) in zip(missing, contexts):
+                item["multi_query_context"] = multi_query_context
+                item["matched"] = matched
+
+    def finish_batch_item(self, item, result, degraded):
+        if not degraded:
+            self.cache_response("insurer", item["cache_key"], result)
+        return self.build_insurer_response(result, item["test_results"], degraded)
+
+    def analyze_batch_item(self, item, timeout, degraded=False, cancelled=None):
+        """cancelled 被設定（客戶端已取消批次）時不再開始或繼續此報告的檢索與生成，回傳 None。"""
+        cancelled = cancelled or threading.Event()
+        try:
+            if cancelled.is_set():
+                return None
+            with self.admission.slot(PRIORITY_INSURER, timeout=timeout):
+                if cancelled.is_set():
+                    return None
+                context_text = item["context_text"]
+                if context_text is None and degraded:
+                    context_text = self.merge_context(item["multi_query_context"], [])
+                elif context_text is None:
+                    hyde_context = []
+                    if self.should_run_hyde(item["use_hyde"], item["matched"]):
+                        hyde_context = self.get_hyde_context(item["query_text"])
+                    context_text = self.merge_context(item["multi_query_context"], hyde_context)
+                    self.context_cache.set(item["context_key"], context_text)
+                result = self.generate_analysis("insurer", context_text, item["query_text"], degraded, cancelled)
+            if cancelled.is_set():
+                return None
+            return self.finish_batch_item(item, result, degraded)
+        except Exception as e:
+            logger.error(f"批次分析報告 {item['report_id']} 失敗：{e}")
+            return self.insurer_failure_response()
+
+    def batch_failure_results(self, pending):
+        """批次共用的步驟（流程判定、合併檢索）失敗時，為每份待分析報告回傳失敗結果。"""
+        return [
+            data_pb2.BatchHealthAnalysisResult(report_id=item["report_id"], result=self.insurer_failure_response())
+            for item in pending
+        ]
+
+    def AnalyzeHealthReportsBatch(self, request, context):
+        logger.info(f"🏢 保險公司批次健康報告分析：{len(request.reports)} 份報告")
+        try:
+            finished, pending = self.prepare_batch(request)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        for report_id, response in finished:
+            yield data_pb2.BatchHealthAnalysisResult(report_id=report_id, result=response)
+        if not pending:
+            return
+
+        try:
+            degraded = self.select_pipeline()
+            self.fill_batch_multi_query_contexts(pending, degraded)
+        except Exception as e:
+            logger.error(f"批次分析檢索失敗：{e}")
+            yield from self.batch_failure_results(pending)
+            return
+        # 以固定深度的管線送出生成，讓 Ollama 持續滿載，結果依完成順序回傳
+        cancelled = threading.Event()
+        executor = futures.ThreadPoolExecutor(max_workers=BATCH_PIPELINE_DEPTH, thread_name_prefix="batch")
+        try:
+            future_ids = {
+                executor.submit(self.analyze_batch_item, item, context.time_remaining(), degraded, cancelled): item["report_id"]
+                for item in pending
+            }
+            for future in futures.as_completed(future_ids):
+                if not context.is_active():
+                    logger.info("客戶端已取消批次分析，停止剩餘生成")
+                    return
+                yield data_pb2.BatchHealthAnalysisResult(report_id=future_ids[future], result=future.result())
+        finally:
+            # 取消（或產生器被關閉）時：尚未開始的項目直接取消，進行中的生成在下一個 token 停止，不等待執行緒結束
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def GetAnalysisQueueStats(self, request, context):
+        return self.queue_stats_response(self.response_cache.stats())
 
     def AnalyzeHealthReportForUser(self, request, context):
         logger.info(f"👤 用戶健康報告分析：報告 ID {request.report_id}")
         try:
-            test_results = json.loads(request.test_results_json)
-            query_text = "\n".join([f"{k}: {v}" for k, v in test_results.items()])
+            test_results, query_text = self.parse_request(request)
+            cache_key = self.response_cache_key("user", test_results)
+            result = self.get_cached_response(cache_key)
+            if result is not None:
+                # 快取中的回應都由完整流程生成，命中時不經過降級判斷，也不標記為降級
+                return self.build_user_response(result)
+            degraded = self.select_pipeline()
+            result = self.run_analysis("user", test_results, query_text, context, cache_key, degraded, request.use_hyde)
+            return self.build_user_response(result, degraded)
 
-            multi_query_context = self.get_multi_query_context(test_results)
-            logger.info(f"Multi-Query 檢索結果：{multi_query_context}")
-
-            hypothetical_doc = self.generate_hypothetical_doc(query_text)
-            hyde_docs_with_scores = self.vectorstore.similarity_search_with_score(hypothetical_doc, k=3)
-            filtered_hyde_docs = [doc for doc, score in hyde_docs_with_scores if score < 0.7]
-            hyde_context = "\n".join([re.sub(r'問題:.*\n回答:', '', doc.page_content.strip(), flags=re.DOTALL) for doc in filtered_hyde_docs if doc.page_content]) if filtered_hyde_docs else "無相關參考資料"
-            logger.info(f"HyDE 檢索結果：{hyde_context}")
-
-            context_text = f"{multi_query_context}\n{hyde_context}".strip() or "無相關參考資料"
-            logger.info(f"合併上下文：{context_text}")
-
-            user_prompt = PromptTemplate.from_template("""
-                你是一位醫療助理，以下是用戶的健康檢查資料：
-                {query}
-                參考上下文（若無則忽略）：
-                {context}
-                根據這些數據，請提供一個詳細的健康總結（逐項分析每個主要指標，與上下文中的正常範圍比較，說明是否異常及潛在影響），具體的改善建議（針對異常指標提供飲食、運動、醫療監測建議），並推薦至少兩種合適的保單類型。
-                所有內容必須使用繁體中文，並以 **完整且嚴格的 JSON 格式** 回應，包含以下字段：
-                {{"summary": "...", "advice": "...", "recommended_policies": ["...", "..."]}}
-                **醫療背景**（僅供參考，優先使用上下文）：
-                - 低密度脂蛋白膽固醇（LDL-C）正常範圍 < 120 mg/dL，偏高可能增加心血管疾病風險。
-                - 高密度脂蛋白膽固醇（HDL-C）正常範圍 > 40 mg/dL，偏低可能影響心血管健康。
-                - 飯前血糖（Glu-AC）正常範圍 70-100 mg/dL，偏高可能提示糖尿病風險。
-                - 糖化血紅蛋白（HbA1c）正常範圍 4%-6%，偏高可能表示長期血糖控制問題。
-                - 血壓正常範圍：收縮壓 < 120 mmHg，舒張壓 < 80 mmHg。
-                - 尿素氮（UN）正常範圍 7-20 mg/dL，偏高可能提示腎功能問題。
-                - 高敏感C反應蛋白（hsCRP）正常範圍 < 1 mg/dL，偏高可能提示炎症或心血管風險。
-                **注意**：
-                - **僅輸出 JSON 內容**，不得包含任何前綴、後綴、說明文字或 Markdown 格式。
-                - 確保 JSON 格式完整，包含所有括號和逗號。
-                - **summary 和 advice 必須完全使用繁體中文**，不得包含英文或其他語言詞彙。
-                - 指標名稱必須使用以下中文名稱：飯前血糖 (Glu-AC), 糖化血紅蛋白 (HbA1c), 飯後血糖 (Glu-PC), 總膽固醇 (T-CHO), 低密度脂蛋白膽固醇 (LDL-C), 高密度脂蛋白膽固醇 (HDL-C), 三酸甘油酯 (TG), 尿素氮 (UN), 高敏感C反應蛋白 (hsCRP), 血壓 (BP)。
-                - **所有引號必須使用英文雙引號（"）**，不得使用中文引號（「」）。
-                - **recommended_policies 必須是一個字符串數組**，僅包含保單名稱，不得包含描述性文字，至少包含兩種保單類型，且與健康檢查結果相關。
-                - **僅使用提供的健康檢查資料進行分析**，不得假設或添加未提供的數據或診斷（如腦中風）。
-                - 飲食建議需具體，例如每日鹽分攝入量應少於 5 克。
-                - 運動建議需具體，例如每週至少 150 分鐘中等強度運動。
-                - 醫療監測建議需具體，例如每三個月檢查一次血脂。
-                - 不得包含任何額外文字，否則回應將被視為無效。
-            """)
-
-            chain = {"query": RunnablePassthrough(), "context": lambda _: context_text} | user_prompt | self.llm
-            result = chain.invoke({"query": query_text})
-
-            logger.info(f"Raw LLM result: {result}")
-            json_str = self.extract_json(result)
-            if not json_str:
-                logger.warning("無法提取有效 JSON，嘗試修復")
-                default_response = {
-                    "summary": "您的健康數據分析中，部分指標需要進一步確認。",
-                    "advice": "建議定期進行健康檢查，並諮詢專業醫師以獲得更詳細的建議。",
-                    "recommended_policies": ["健康險", "壽險"]
-                }
-                json_str = json.dumps(default_response, ensure_ascii=False)
-
-            result_json = json.loads(json_str)
-            result_json["summary"] = self.translate_text(result_json.get("summary", "無法分析"))
-            result_json["advice"] = self.translate_text(result_json.get("advice", "無建議"))
-            recommended_policies = self.translate_policies(result_json.get("recommended_policies", []))
-            result_json["recommended_policies"] = recommended_policies if recommended_policies else ["健康險", "壽險"]
-
-            return data_pb2.UserHealthAnalysisResponse(
-                summary=result_json.get("summary", "無法分析"),
-                advice=result_json.get("advice", "無建議"),
-                recommended_policy=", ".join(recommended_policies) if recommended_policies else "無推薦保單",
-                success=True
-            )
+        except AdmissionRejected as e:
+            self.reject(context, e)
 
         except Exception as e:
             logger.error(f"用戶健康報告分析失敗：{e}")
-            return data_pb2.UserHealthAnalysisResponse(
-                summary="分析失敗",
-                advice="請稍後重試",
-                recommended_policy="無推薦保單",
-                success=False
-            )
+            return self.user_failure_response()
 
     def AnalyzeHealthReportForInsurer(self, request, context):
         logger.info(f"🏢 保險公司健康報告分析：報告 ID {request.report_id}")
         try:
-            test_results = json.loads(request.test_results_json)
-            query_text = "\n".join([f"{k}: {v}" for k, v in test_results.items()])
+            test_results, query_text = self.parse_request(request, "insurer")
+            if request.risks_only:
+                return self.risks_only_response(test_results)
+            cache_key = self.response_cache_key("insurer", test_results)
+            result = self.get_cached_response(cache_key)
+            if result is not None:
+                return self.build_insurer_response(result, test_results)
+            degraded = self.select_pipeline()
+            result = self.run_analysis("insurer", test_results, query_text, context, cache_key, degraded, request.use_hyde)
+            return self.build_insurer_response(result, test_results, degraded)
 
-            multi_query_context = self.get_multi_query_context(test_results)
-            logger.info(f"Multi-Query 檢索結果：{multi_query_context}")
-
-            hypothetical_doc = self.generate_hypothetical_doc(query_text)
-            hyde_docs_with_scores = self.vectorstore.similarity_search_with_score(hypothetical_doc, k=3)
-            filtered_hyde_docs = [doc for doc, score in hyde_docs_with_scores if score < 0.7]
-            hyde_context = "\n".join([re.sub(r'問題:.*\n回答:', '', doc.page_content.strip(), flags=re.DOTALL) for doc in filtered_hyde_docs if doc.page_content]) if filtered_hyde_docs else "無相關參考資料"
-            logger.info(f"HyDE 檢索結果：{hyde_context}")
-
-            context_text = f"{multi_query_context}\n{hyde_context}".strip() or "無相關參考資料"
-            logger.info(f"合併上下文：{context_text}")
-
-            insurer_prompt = PromptTemplate.from_template("""
-                作為保險公司分析師，你收到以下體檢資料：
-                {query}
-                參考上下文（若無則忽略）：
-                {context}
-                請分析所有指標（逐項與正常範圍比較，說明是否異常及潛在影響），評估潛在風險疾病（包括詳細描述和長期影響），建議至少兩種對應保單種類，並輸出 **完整且嚴格的 JSON 格式**：
-                {{"summary": "...", "metrics": {{...}}, "policy_types": ["...", "..."], "risks": [{{"disease": "...", "impact": "...", "description": "..."}}, ...], "insurance_suitability": "..."}}
-                **醫療背景**（僅供參考，優先使用上下文）：
-                - 低密度脂蛋白膽固醇（LDL-C）正常範圍 < 120 mg/dL，偏高可能增加心血管疾病風險。
-                - 高密度脂蛋白膽固醇（HDL-C）正常範圍 > 40 mg/dL，偏低可能影響心血管健康。
-                - 飯前血糖（Glu-AC）正常範圍 70-100 mg/dL，偏高可能提示糖尿病風險。
-                - 糖化血紅蛋白（HbA1c）正常範圍 4%-6%，偏高可能表示長期血糖控制問題。
-                - 血壓正常範圍：收縮壓 < 120 mmHg，舒張壓 < 80 mmHg。
-                - 尿素氮（UN）正常範圍 7-20 mg/dL，偏高可能提示腎功能問題。
-                - 高敏感C反應蛋白（hsCRP）正常範圍 < 1 mg/dL，偏高可能提示炎症或心血管風險。
-                **注意**：
-                - **僅輸出 JSON 內容**，不得包含任何前綴、後綴、說明文字或 Markdown 格式。
-                - 確保 JSON 格式完整，包含所有括號和逗號。
-                - **metrics 的鍵必須以雙引號包裹**，並使用提供的指標名稱和數值，嚴格基於輸入數據，不得硬編碼或改變數值。
-                - **metrics 的值必須是數字或簡單字符串**，例如 89 或 "127"。
-                - **metrics 必須包含所有提供的指標**，不得省略。
-                - **summary、policy_types、risks 中的 disease、impact、description 以及 insurance_suitability 必須完全使用繁體中文**，不得包含英文。
-                - 指標名稱必須使用以下中文名稱：飯前血糖 (Glu-AC), 糖化血紅蛋白 (HbA1c), 飯後血糖 (Glu-PC), 總膽固醇 (T-CHO), 低密度脂蛋白膽固醇 (LDL-C), 高密度脂蛋白膽固醇 (HDL-C), 三酸甘油酯 (TG), 尿素氮 (UN), 高敏感C反應蛋白 (hsCRP), 血壓 (BP)。
-                - **所有引號必須使用英文雙引號（"）**，不得使用中文引號（「」）。
-                - **policy_types 必須是一個字符串數組**，僅包含保單名稱，不得包含描述性文字。
-                - **risks 不得為空**，必須提供至少一個具體的疾病風險，針對異常指標。
-                - **summary 和 insurance_suitability 不得為空**，必須提供具體內容。
-                - **僅使用提供的健康檢查資料進行分析**，不得假設或添加未提供的數據（如腦中風）。
-                - 不得包含任何額外文字，否則回應將被視為無效。
-            """)
-
-            chain = {"query": RunnablePassthrough(), "context": lambda _: context_text} | insurer_prompt | self.llm
-            result = chain.invoke({"query": query_text})
-            logger.info(f"Raw LLM result: {result}")
-
-            json_str = self.extract_json(result)
-            if not json_str:
-                raise ValueError("無法從回應中提取有效 JSON")
-
-            result_json = json.loads(json_str)
-
-            metrics = self.clean_metrics(result_json.get("metrics", test_results), test_results)
-            metrics_str = ", ".join([f"{k}: {v}" for k, v in metrics.items()]) if isinstance(metrics, dict) else str(metrics)
-
-            risks = self.translate_risks(result_json.get("risks", []))
-            if not risks:
-                risks = [{
-                    "disease": "潛在代謝疾病",
-                    "impact": "中度",
-                    "description": "本次體檢結果顯示低密度脂蛋白膽固醇和尿素氮值偏高，可能表明有心血管或腎功能風險。"
-                }]
-            risks_proto = [
-                data_pb2.Risk(
-                    disease=r.get("disease", "未知"),
-                    impact=r.get("impact", "無"),
-                    description=r.get("description", "無描述")
-                ) for r in risks
-            ]
-
-            summary = self.translate_text(result_json.get("summary", "").strip() or "無摘要")
-            policy_types = self.translate_policies(result_json.get("policy_types", []))
-            if not policy_types or len(policy_types) < 2:
-                policy_types = ["健康險", "壽險"]
-            insurance_suitability = self.translate_text(result_json.get("insurance_suitability", "").strip() or "請人工審核")
-
-            return data_pb2.InsurerHealthAnalysisResponse(
-                summary=summary,
-                metrics=metrics_str,
-                policy_type=", ".join(policy_types) if policy_types else "無保單",
-                risks=risks_proto,
-                insurance_suitability=insurance_suitability,
-                success=True
-            )
+        except AdmissionRejected as e:
+            self.reject(context, e)
 
         except Exception as e:
             logger.error(f"保險公司健康報告分析失敗：{e}")
-            return data_pb2.InsurerHealthAnalysisResponse(
-                summary="分析失敗",
-                metrics="異常",
-                policy_type="無法推薦保單",
-                risks=[data_pb2.Risk(disease="未知", impact="無", description="分析失敗")],
-                insurance_suitability="請人工審核",
-                success=False
+            return self.insurer_failure_response()
+
+    def StreamHealthReportForUser(self, request, context):
+        logger.info(f"👤 用戶健康報告串流分析：報告 ID {request.report_id}")
+        try:
+            test_results, query_text = self.parse_request(request)
+            cache_key = self.response_cache_key("user", test_results)
+            result = self.get_cached_response(cache_key)
+            if result is not None:
+                yield data_pb2.UserHealthAnalysisChunk(token=result)
+                yield data_pb2.UserHealthAnalysisChunk(result=self.build_user_response(result))
+                return
+            degraded = self.select_pipeline()
+            tokens = []
+            for token in self.stream_analysis("user", test_results, query_text, context, cache_key, degraded, request.use_hyde):
+                tokens.append(token)
+                yield data_pb2.UserHealthAnalysisChunk(token=token)
+            if context.is_active():
+                yield data_pb2.UserHealthAnalysisChunk(result=self.build_user_response("".join(tokens), degraded))
+
+        except AdmissionRejected as e:
+            self.reject(context, e)
+
+        except Exception as e:
+            logger.error(f"用戶健康報告串流分析失敗：{e}")
+            yield data_pb2.UserHealthAnalysisChunk(result=self.user_failure_response())
+
+    def StreamHealthReportForInsurer(self, request, context):
+        logger.info(f"🏢 保險公司健康報告串流分析：報告 ID {request.report_id}")
+        try:
+            test_results, query_text = self.parse_request(request, "insurer")
+            if request.risks_only:
+                yield data_pb2.InsurerHealthAnalysisChunk(result=self.risks_only_response(test_results))
+                return
+            cache_key = self.response_cache_key("insurer", test_results)
+            result = self.get_cached_response(cache_key)
+            if result is not None:
+                yield data_pb2.InsurerHealthAnalysisChunk(token=result)
+                yield data_pb2.InsurerHealthAnalysisChunk(result=self.build_insurer_response(result, test_results))
+                return
+            degraded = self.select_pipeline()
+            tokens = []
+            for token in self.stream_analysis("insurer", test_results, query_text, context, cache_key, degraded, request.use_hyde):
+                tokens.append(token)
+                yield data_pb2.InsurerHealthAnalysisChunk(token=token)
+            if context.is_active():
+                yield data_pb2.InsurerHealthAnalysisChunk(result=self.build_insurer_response("".join(tokens), test_results, degraded))
+
+        except AdmissionRejected as e:
+            self.reject(context, e)
+
+        except Exception as e:
+            logger.error(f"保險公司健康報告串流分析失敗：{e}")
+            yield data_pb2.InsurerHealthAnalysisChunk(result=self.insurer_failure_response())
+
+class AsyncHealthAnalysisServicer(HealthAnalysisServicer):
+    """grpc.aio 版本：等待 Ollama 的請求只佔用協程而非執行緒，嵌入與向量檢索交由有界執行緒池執行。"""
+
+    def init_concurrency(self):
+        # HyDE 與類別檢索以 asyncio.gather 並行，不需要 retrieval_executor
+        self.embedding_executor = futures.ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding")
+        self.admission = AsyncAdmissionController(max_concurrent=LLM_MAX_CONCURRENT, max_queue=LLM_MAX_QUEUE)
+        self.single_flight = AsyncSingleFlight()
+
+    async def run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.embedding_executor, func, *args)
+
+    async def agenerate_hypothetical_doc(self, query_text):
+        hypothetical_doc = await self.gateway.ainvoke("hyde", {"query": query_text})
+        logger.info(f"HyDE 假設性文件：{hypothetical_doc}")
+        return hypothetical_doc.strip()
+
+    async def aget_hyde_context(self, query_text):
+        hypothetical_doc = await self.agenerate_hypothetical_doc(query_text)
+        results = await self.run_blocking(self.batch_similarity_search, [hypothetical_doc])
+        return self.format_hyde_context(results[0])
+
+    async def aget_cached_context(self, test_results, query_text, degraded=False, use_hyde=False):
+        cache_key = await self.run_blocking(self.context_cache_key, test_results, use_hyde)
+        context_text = self.context_cache.get(cache_key)
+        if context_text is not None:
+            logger.info(f"檢索上下文快取命中：{cache_key[:12]}")
+            return context_text
+        if degraded:
+            multi_query_context = await self.run_blocking(
+                self.get_multi_query_context, test_results, None, BROWNOUT_RETRIEVAL_K
             )
+            return self.merge_context(multi_query_context, [])
+        retrieval = self.run_blocking(self.retrieve_multi_query, [test_results], [self.templated_summary(test_results)])
+        hyde_context = []
+        if use_hyde:
+            results, hyde_context = await asyncio.gather(retrieval, self.aget_hyde_context(query_text))
+            (multi_query_context, matched), = results
+            self.should_run_hyde(use_hyde, matched)
+        else:
+            (multi_query_context, matched), = await retrieval
+            if self.should_run_hyde(use_hyde, matched):
+                hyde_context = await self.aget_hyde_context(query_text)
+        context_text = self.merge_context(multi_query_context, hyde_context)
+        self.context_cache.set(cache_key, context_text)
+        return context_text
+
+    async def astream_analysis(self, audience, test_results, query_text, context, cache_key, degraded=False,
+                               use_hyde=False):
+        async with self.admission.slot(PRIORITIES[audience], timeout=context.time_remaining()):
+            context_text = await self.aget_cached_context(test_results, query_text, degraded, use_hyde)
+            # 客戶端取消時協程收到 CancelledError，finally 中關閉串流即中止 Ollama 生成
+            parser = StreamingJSONParser()
+            stream = self.gateway.astream(
+                self.analysis_chain(audience, degraded), {"query": query_text, "context": context_text},
+                timeout=context.time_remaining()
+            )
+            try:
+                async for token in stream:
+                    yield token
+                    if parser.feed(token):
+                        logger.info("JSON 物件已完整，提前結束生成")
+                        break
+            finally:
+                await stream.aclose()
+        if not degraded:
+            await self.run_blocking(self.cache_response, audience, cache_key, parser.text)
+
+    async def agenerate_analysis(self, audience, context_text, query_text, degraded=False):
+        parser = StreamingJSONParser()
+        stream = self.gateway.astream(self.analysis_chain(audience, degraded), {"query": query_text, "context": context_text})
+        try:
+            async for token in stream:
+                if parser.feed(token):
+                    logger.info("JSON 物件已完整，提前結束生成")
+                    break
+        finally:
+            await stream.aclose()
+        return parser.text
+
+    async def analyze_batch_item_async(self, item, timeout, pipeline, degraded=False):
+        try:
+            async with pipeline, self.admission.slot(PRIORITY_INSURER, timeout=timeout):
+                context_text = item["context_text"]
+                if context_text is None and degraded:
+                    context_text = self.merge_context(item["multi_query_context"], [])
+                elif context_text is None:
+                    hyde_context = []
+                    if self.should_run_hyde(item["use_hyde"], item["matched"]):
+                        hyde_context = await self.aget_hyde_context(item["query_text"])
+                    context_text = self.merge_context(item["multi_query_context"], hyde_context)
+                    self.context_cache.set(item["context_key"], context_text)
+                result = await self.agenerate_analysis("insurer", context_text, item["query_text"], degraded)
+            return item["report_id"], await self.run_blocking(self.finish_batch_item, item, result, degraded)
+        except Exception as e:
+            logger.error(f"批次分析報告 {item['report_id']} 失敗：{e}")
+            return item["report_id"], self.insurer_failure_response()
+
+    async def AnalyzeHealthReportsBatch(self, request, context):
+        logger.info(f"🏢 保險公司批次健康報告分析：{len(request.reports)} 份報告")
+        try:
+            finished, pending = await self.run_blocking(self.prepare_batch, request)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        for report_id, response in finished:
+            yield data_pb2.BatchHealthAnalysisResult(report_id=report_id, result=response)
+        if not pending:
+            return
+
+        try:
+            degraded = self.select_pipeline()
+            await self.run_blocking(self.fill_batch_multi_query_contexts, pending, degraded)
+        except Exception as e:
+            logger.error(f"批次分析檢索失敗：{e}")
+            for result in self.batch_failure_results(pending):
+                yield result
+            return
+        pipeline = asyncio.Semaphore(BATCH_PIPELINE_DEPTH)
+        tasks = [
+            asyncio.create_task(self.analyze_batch_item_async(item, context.time_remaining(), pipeline, degraded))
+            for item in pending
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                report_id, response = await task
+                yield data_pb2.BatchHealthAnalysisResult(report_id=report_id, result=response)
+        finally:
+            # 客戶端取消時停止剩餘生成
+            for task in tasks:
+                task.cancel()
+
+    async def arun_analysis(self, audience, test_results, query_text, context, cache_key, degraded=False,
+                            use_hyde=False):
+        return await self.single_flight.do(
+            (cache_key, degraded, use_hyde),
+            lambda: self.acompute_analysis(audience, test_results, query_text, cache_key, context, degraded, use_hyde)
+        )
+
+    async def acompute_analysis(self, audience, test_results, query_text, cache_key, context, degraded=False,
+                                use_hyde=False):
+        async with self.admission.slot(PRIORITIES[audience], timeout=context.time_remaining()):
+            context_text = await self.aget_cached_context(test_results, query_text, degraded, use_hyde)
+            result = await self.agenerate_analysis(audience, context_text, query_text, degraded)
+        if not degraded:
+            await self.run_blocking(self.cache_response, audience, cache_key, result)
+        return result
+
+    async def reject(self, context, error):
+        if isinstance(error, AdmissionDeadlineExceeded):
+            logger.warning(f"請求逾時，不再分析：{error}")
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(error))
+        logger.warning(f"LLM 佇列已滿，拒絕請求：{error}")
+        context.set_trailing_metadata((("retry-after-ms", str(int(error.retry_after * 1000))),))
+        await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(error))
+
+    async def GetAnalysisQueueStats(self, request, context):
+        return self.queue_stats_response(await self.run_blocking(self.response_cache.stats))
+
+    async def AnalyzeHealthReportForUser(self, request, context):
+        logger.info(f"👤 用戶健康報告分析：報告 ID {request.report_id}")
+        try:
+            test_results, query_text = self.parse_request(request)
+            cache_key = self.response_cache_key("user", test_results)
+            # 回應快取的 SQLite 讀寫（含 commit）在執行緒池中執行，不阻塞事件迴圈
+            result = await self.run_blocking(self.get_cached_response, cache_key)
+            if result is not None:
+                # 快取中的回應都由完整流程生成，命中時不經過降級判斷，也不標記為降級
+                return self.build_user_response(result)
+            degraded = self.select_pipeline()
+            result = await self.arun_analysis("user", test_results, query_text, context, cache_key, degraded, request.use_hyde)
+            return self.build_user_response(result, degraded)
+
+        except AdmissionRejected as e:
+            await self.reject(context, e)
+
+        except Exception as e:
+            logger.error(f"用戶健康報告分析失敗：{e}")
+            return self.user_failure_response()
+
+    async def AnalyzeHealthReportForInsurer(self, request, context):
+        logger.info(f"🏢 保險公司健康報告分析：報告 ID {request.report_id}")
+        try:
+            test_results, query_text = self.parse_request(request, "insurer")
+            if request.risks_only:
+                return self.risks_only_response(test_results)
+            cache_key = self.response_cache_key("insurer", test_results)
+            result = await self.run_blocking(self.get_cached_response, cache_key)
+            if result is not None:
+                return self.build_insurer_response(result, test_results)
+            degraded = self.select_pipeline()
+            result = await self.arun_analysis("insurer", test_results, query_text, context, cache_key, degraded, request.use_hyde)
+            return self.build_insurer_response(result, test_results, degraded)
+
+        except AdmissionRejected as e:
+            await self.reject(context, e)
+
+        except Exception as e:
+            logger.error(f"保險公司健康報告分析失敗：{e}")
+            return self.insurer_failure_response()
+
+    async def StreamHealthReportForUser(self, request, context):
+        logger.info(f"👤 用戶健康報告串流分析：報告 ID {request.report_id}")
+        try:
+            test_results, query_text = self.parse_request(request)
+            cache_key = self.response_cache_key("user", test_results)
+            result = await self.run_blocking(self.get_cached_response, cache_key)
+            if result is not None:
+                yield data_pb2.UserHealthAnalysisChunk(token=result)
+                yield data_pb2.UserHealthAnalysisChunk(result=self.build_user_response(result))
+                return
+            degraded = self.select_pipeline()
+            tokens = []
+            async for token in self.astream_analysis("user", test_results, query_text, context, cache_key, degraded, request.use_hyde):
+                tokens.append(token)
+                yield data_pb2.UserHealthAnalysisChunk(token=token)
+            yield data_pb2.UserHealthAnalysisChunk(result=self.build_user_response("".join(tokens), degraded))
+
+        except AdmissionRejected as e:
+            await self.reject(context, e)
+
+        except Exception as e:
+            logger.error(f"用戶健康報告串流分析失敗：{e}")
+            yield data_pb2.UserHealthAnalysisChunk(result=self.user_failure_response())
+
+    async def StreamHealthReportForInsurer(self, request, context):
+        logger.info(f"🏢 保險公司健康報告串流分析：報告 ID {request.report_id}")
+        try:
+            test_results, query_text = self.parse_request(request, "insurer")
+            if request.risks_only:
+                yield data_pb2.InsurerHealthAnalysisChunk(result=self.risks_only_response(test_results))
+                return
+            cache_key = self.response_cache_key("insurer", test_results)
+            result = await self.run_blocking(self.get_cached_response, cache_key)
+            if result is not None:
+                yield data_pb2.InsurerHealthAnalysisChunk(token=result)
+                yield data_pb2.InsurerHealthAnalysisChunk(result=self.build_insurer_response(result, test_results))
+                return
+            degraded = self.select_pipeline()
+            tokens = []
+            async for token in self.astream_analysis("insurer", test_results, query_text, context, cache_key, degraded, request.use_hyde):
+                tokens.append(token)
+                yield data_pb2.InsurerHealthAnalysisChunk(token=token)
+            yield data_pb2.InsurerHealthAnalysisChunk(result=self.build_insurer_response("".join(tokens), test_results, degraded))
+
+        except AdmissionRejected as e:
+            await self.reject(context, e)
+
+        except Exception as e:
+            logger.error(f"保險公司健康報告串流分析失敗：{e}")
+            yield data_pb2.InsurerHealthAnalysisChunk(result=self.insurer_failure_response())
+
+def create_server(servicer=None, address='[::]:50051'):
+    """建立 thread 模式的 gRPC 伺服器（尚未啟動），回傳 (server, 實際綁定的端口)。"""
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=GRPC_MAX_WORKERS),
+        maximum_concurrent_rpcs=GRPC_MAX_WORKERS
+    )
+    data_pb2_grpc.add_HealthServiceServicer_to_server(servicer or HealthAnalysisServicer(), server)
+    port = server.add_insecure_port(address)
+    return server, port
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    data_pb2_grpc.add_HealthServiceServicer_to_server(HealthAnalysisServicer(), server)
-    server.add_insecure_port('[::]:50051')
+    server, port = create_server()
     server.start()
-    logger.info("🚀 服務器已啟動，監聽端口 50051")
+    logger.info(f"🚀 服務器已啟動，監聽端口 {port}（工作執行緒 {GRPC_MAX_WORKERS}）")
     server.wait_for_termination()
 
+async def serve_aio():
+    server = grpc.aio.server()
+    data_pb2_grpc.add_HealthServiceServicer_to_server(AsyncHealthAnalysisServicer(), server)
+    server.add_insecure_port('[::]:50051')
+    await server.start()
+    logger.info("🚀 服務器已啟動（grpc.aio 模式），監聽端口 50051")
+    await server.wait_for_termination()
+
 if __name__ == "__main__":
-    serve()
\ No newline at end of file
+    if GRPC_SERVER_MODE == "aio":
+        asyncio.run(serve_aio())
+    else:
+        serve()
\ No newline at end of file
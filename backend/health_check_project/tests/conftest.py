@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 受測模組（test.py、admission.py 等）位於上層的 health_check_project 目錄
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionDeadlineExceeded, AsyncAdmissionController, PRIORITY_USER
+
+
+def test_expired_deadline_is_rejected_even_with_free_slot():
+    admission = AdmissionController(max_concurrent=2, max_queue=4)
+    with pytest.raises(AdmissionDeadlineExceeded):
+        admission.acquire(PRIORITY_USER, timeout=0)
+    stats = admission.stats()
+    assert stats["active"] == 0
+    assert stats["admitted"] == 0
+    assert stats["rejected"] == 1
+
+
+def test_unlimited_deadline_is_admitted():
+    admission = AdmissionController(max_concurrent=1, max_queue=0)
+    # 未設定 deadline 時 gRPC 回傳極大的剩餘時間
+    with admission.slot(PRIORITY_USER, timeout=1e12):
+        assert admission.stats()["active"] == 1
+    assert admission.stats()["active"] == 0
+
+
+def test_async_expired_deadline_is_rejected_even_with_free_slot():
+    async def scenario():
+        admission = AsyncAdmissionController(max_concurrent=2, max_queue=4)
+        with pytest.raises(AdmissionDeadlineExceeded):
+            await admission.acquire(PRIORITY_USER, timeout=0)
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["rejected"] == 1
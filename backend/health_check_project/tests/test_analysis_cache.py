@@ -0,0 +1,10 @@
+from analysis_cache import ResponseCache
+
+
+def test_response_cache_reports_hit_rate(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    assert cache.stats()["hit_rate"] == 0.0
+    assert cache.get("report") is None
+    cache.set("report", "{}")
+    assert cache.get("report") == "{}"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
@@ -0,0 +1,23 @@
+from brownout import BrownoutController
+
+
+def test_short_queue_does_not_trip():
+    brownout = BrownoutController(enter_depth=16, exit_depth=8, min_hold=0)
+    for depth in (0, 1, 2, 15):
+        assert brownout.update(depth) == (False, False)
+    assert brownout.stats()["degraded_requests"] == 0
+
+
+def test_hysteresis_between_enter_and_exit_depth():
+    brownout = BrownoutController(enter_depth=16, exit_depth=8, min_hold=0)
+    assert brownout.update(16) == (True, True)
+    # 介於兩個門檻之間時維持降級
+    assert brownout.update(10) == (True, False)
+    assert brownout.update(7) == (False, True)
+    assert brownout.stats()["transitions"] == 2
+
+
+def test_min_hold_delays_recovery():
+    brownout = BrownoutController(enter_depth=4, exit_depth=2, min_hold=3600)
+    assert brownout.update(4) == (True, True)
+    assert brownout.update(0) == (True, False)
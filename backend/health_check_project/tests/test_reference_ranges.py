@@ -0,0 +1,34 @@
+from reference_ranges import (
+    BORDERLINE_HIGH, MISSING, NORMAL, REFERENCE_RANGES, evaluate_metric, evaluate_results, summarize_findings
+)
+
+
+def test_missing_metric_is_not_summarized_as_normal():
+    report = {"Glu-AC": "89 mg/dL", "HbA1c": "N/A", "LDL-C": "128 mg/dL"}
+    findings = evaluate_results(report)
+    assert evaluate_metric("HbA1c", "N/A").status == MISSING
+
+    summary = summarize_findings(findings)
+    lines = summary.splitlines()
+    missing_lines = [line for line in lines if "HbA1c" in line]
+    assert missing_lines == ["未檢測（無檢驗結果，不可視為正常）：HbA1c"]
+    assert "其餘 1 項已檢測指標均在正常範圍內。" in lines
+    assert not summary.startswith("全部")
+
+
+def test_all_missing_report_does_not_claim_normal():
+    summary = summarize_findings(evaluate_results({"Glu-AC": "", "Hb": "未檢測"}))
+    assert "正常範圍內" not in summary
+    assert "Glu-AC" in summary and "Hb" in summary
+
+
+def test_mid_range_values_are_normal():
+    for name, (low, high, unit) in REFERENCE_RANGES.items():
+        if low is not None and high is not None:
+            assert evaluate_metric(name, f"{(low + high) / 2} {unit}").status == NORMAL, name
+
+
+def test_borderline_band_uses_range_width():
+    assert evaluate_metric("Specific Gravity", "1.015").status == NORMAL
+    assert evaluate_metric("MCHC", "33.5 g/dL").status == NORMAL
+    assert evaluate_metric("Glu-AC", "99 mg/dL").status == BORDERLINE_HIGH
@@ -0,0 +1,50 @@
+import queue
+import threading
+
+import grpc
+import pytest
+from google.protobuf import empty_pb2
+
+pytest.importorskip("langchain_huggingface")
+
+import data_pb2
+import data_pb2_grpc
+import test as server_module
+
+
+class BlockingServicer(data_pb2_grpc.HealthServiceServicer):
+    """每個 RPC 都佔用一個工作執行緒直到 release 被設定。"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def GetAnalysisQueueStats(self, request, context):
+        self.release.wait(10)
+        return data_pb2.AnalysisQueueStats()
+
+
+def test_serve_rejects_rpcs_beyond_worker_capacity():
+    assert server_module.GRPC_MAX_WORKERS >= server_module.LLM_MAX_CONCURRENT + server_module.LLM_MAX_QUEUE
+    servicer = BlockingServicer()
+    server, port = server_module.create_server(servicer, "127.0.0.1:0")
+    server.start()
+    overflow = 5
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = data_pb2_grpc.HealthServiceStub(channel)
+            completed = queue.Queue()
+            calls = []
+            for _ in range(server_module.GRPC_MAX_WORKERS + overflow):
+                call = stub.GetAnalysisQueueStats.future(empty_pb2.Empty(), timeout=20)
+                call.add_done_callback(completed.put)
+                calls.append(call)
+            # 工作執行緒全數被佔用時，超出的 RPC 應立即被拒絕，而不是在執行緒池中排隊
+            exhausted = [completed.get(timeout=10).code() for _ in range(overflow)]
+            servicer.release.set()
+            codes = [call.code() for call in calls]
+    finally:
+        servicer.release.set()
+        server.stop(None)
+    assert exhausted == [grpc.StatusCode.RESOURCE_EXHAUSTED] * overflow
+    assert codes.count(grpc.StatusCode.RESOURCE_EXHAUSTED) == overflow
+    assert codes.count(grpc.StatusCode.OK) == server_module.GRPC_MAX_WORKERS